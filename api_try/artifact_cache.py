@@ -0,0 +1,266 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from typing import IO, Callable, Dict, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "cache_manifest.json"
+INDEX = "index.json"
+
+
+def _sha256_file(path: str, chunk_size: int = 8 * 1024 * 1024) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _build_manifest(directory: str) -> Dict:
+    """Checksum por fichero + checksum global del artefacto (orden estable)."""
+    files = {}
+    total = 0
+    for base, _, names in os.walk(directory):
+        for name in names:
+            if name == MANIFEST:
+                continue
+            full = os.path.join(base, name)
+            rel = os.path.relpath(full, directory)
+            files[rel] = {"sha256": _sha256_file(full), "size": os.path.getsize(full)}
+            total += files[rel]["size"]
+
+    h = hashlib.sha256()
+    for rel in sorted(files):
+        h.update(rel.encode())
+        h.update(files[rel]["sha256"].encode())
+    return {"checksum": h.hexdigest(), "size": total, "files": files}
+
+
+class ArtifactCache:
+    """
+    Caché local y persistente de artefactos de modelo.
+
+    Cada entrada vive en `<root>/<name>/v<version>-<checksum[:12]>/` junto a
+    un manifiesto con el sha256 de cada fichero. Un índice con la fecha de
+    último acceso permite desalojar por LRU cuando se supera `max_bytes`.
+    Varios procesos pueden compartir el mismo directorio (lock con flock).
+    Mientras un proceso carga una entrada (`with fetch(...)`) tiene además un
+    lock compartido sobre `<entrada>.lock` y el desalojo se la salta.
+
+    El sha256 se calcula una sola vez, en `_put`. Un HIT solo comprueba el
+    manifiesto y el tamaño de cada fichero (verify="size"); con
+    verify="full" se rehashea además la primera vez que este proceso usa la
+    entrada, siempre fuera del lock (un artefacto de varios GB bloquearía a
+    las demás réplicas).
+    """
+
+    def __init__(self, root: str, max_bytes: int, verify: str = "size"):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.verify = verify  # "size" (manifiesto + tamaños) | "full" (+ sha256 una vez por proceso)
+        self._hashed = set()  # rutas ya rehasheadas por este proceso
+        os.makedirs(self.root, exist_ok=True)
+
+    @contextmanager
+    def _locked(self):
+        with open(os.path.join(self.root, ".lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_index(self) -> Dict:
+        try:
+            with open(os.path.join(self.root, INDEX)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_index(self, index: Dict):
+        tmp = os.path.join(self.root, f"{INDEX}.tmp")
+        with open(tmp, "w") as f:
+            json.dump(index, f, indent=2)
+        os.replace(tmp, os.path.join(self.root, INDEX))
+
+    @staticmethod
+    def _key(name: str, version) -> str:
+        return f"{name}/{version}"
+
+    @staticmethod
+    def _read_manifest(path: str) -> Optional[Dict]:
+        try:
+            with open(os.path.join(path, MANIFEST)) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _check_sizes(entry: Dict, manifest: Optional[Dict]) -> bool:
+        """Comprobación barata: manifiesto del mismo artefacto y tamaños intactos"""
+        if manifest is None or manifest.get("checksum") != entry["checksum"]:
+            return False
+        for rel, meta in manifest["files"].items():
+            full = os.path.join(entry["path"], rel)
+            if not os.path.isfile(full) or os.path.getsize(full) != meta["size"]:
+                return False
+        return True
+
+    @staticmethod
+    def _check_hashes(path: str, manifest: Dict) -> bool:
+        try:
+            return all(
+                _sha256_file(os.path.join(path, rel)) == meta["sha256"]
+                for rel, meta in manifest["files"].items()
+            )
+        except OSError:
+            return False
+
+    @staticmethod
+    def _pin(path: str) -> IO:
+        """
+        Lock compartido sobre la entrada; llamar con el lock del índice (así
+        nunca espera: el exclusivo de `_remove_unused` solo se toma dentro).
+        """
+        lock_file = open(path + ".lock", "a")
+        fcntl.flock(lock_file, fcntl.LOCK_SH)
+        return lock_file
+
+    @staticmethod
+    def _remove_unused(path: str) -> bool:
+        """
+        Borra la entrada si ningún proceso la está cargando (lock exclusivo
+        sin esperar); llamar con el lock del índice. False si está en uso.
+        """
+        lock_path = path + ".lock"
+        with open(lock_path, "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return False
+            shutil.rmtree(path, ignore_errors=True)
+            os.remove(lock_path)
+        return True
+
+    def _discard(self, key: str, path: str):
+        """Elimina la entrada si el índice sigue apuntando a `path`"""
+        with self._locked():
+            index = self._read_index()
+            entry = index.get(key)
+            if entry is None or entry["path"] != path:
+                return
+            shutil.rmtree(path, ignore_errors=True)
+            del index[key]
+            self._write_index(index)
+
+    def _get(self, name: str, version) -> Optional[Tuple[str, IO]]:
+        """(ruta, lock compartido) si el artefacto está en caché y es íntegro; si no, None."""
+        key = self._key(name, version)
+        with self._locked():
+            index = self._read_index()
+            entry = index.get(key)
+            if entry is None:
+                return None
+
+            manifest = self._read_manifest(entry["path"])
+            if not self._check_sizes(entry, manifest):
+                logger.warning(f" Entrada de caché corrupta para {key}, se descarta")
+                shutil.rmtree(entry["path"], ignore_errors=True)
+                del index[key]
+                self._write_index(index)
+                return None
+
+            entry["last_access"] = time.time()
+            self._write_index(index)
+            path = entry["path"]
+            lock_file = self._pin(path)
+
+        if self.verify == "full" and path not in self._hashed:
+            # Sin lock: las demás réplicas siguen usando la caché mientras tanto
+            if not self._check_hashes(path, manifest):
+                logger.warning(f" Checksum incorrecto en la caché para {key}, se descarta")
+                lock_file.close()
+                self._discard(key, path)
+                return None
+            self._hashed.add(path)
+        return path, lock_file
+
+    def _put(self, name: str, version, src_dir: str) -> Tuple[str, IO]:
+        """Mueve `src_dir` a la caché (mismo filesystem), desaloja por LRU y devuelve (ruta, lock compartido)."""
+        # Único hash del artefacto, antes de tomar el lock
+        manifest = _build_manifest(src_dir)
+        with open(os.path.join(src_dir, MANIFEST), "w") as f:
+            json.dump(manifest, f, indent=2)
+
+        key = self._key(name, version)
+        dest = os.path.join(self.root, name, f"v{version}-{manifest['checksum'][:12]}")
+        with self._locked():
+            index = self._read_index()
+            if os.path.exists(dest):
+                shutil.rmtree(src_dir, ignore_errors=True)
+            else:
+                os.makedirs(os.path.dirname(dest), exist_ok=True)
+                os.replace(src_dir, dest)
+
+            self._hashed.add(dest)
+            lock_file = self._pin(dest)
+            index[key] = {
+                "path": dest,
+                "checksum": manifest["checksum"],
+                "size": manifest["size"],
+                "last_access": time.time(),
+            }
+            self._evict(index, keep=key)
+            self._write_index(index)
+
+        logger.info(f" Artefacto {key} cacheado en {dest} ({manifest['size'] / 1e6:.1f} MB)")
+        return dest, lock_file
+
+    def _evict(self, index: Dict, keep: str):
+        total = sum(e["size"] for e in index.values())
+        for key, entry in sorted(index.items(), key=lambda kv: kv[1]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            if not self._remove_unused(entry["path"]):
+                logger.info(f" {key} se está cargando en otro proceso: no se desaloja todavía")
+                continue
+            logger.info(f" Desalojada {key} de la caché ({entry['size'] / 1e6:.1f} MB)")
+            total -= entry["size"]
+            del index[key]
+
+    @contextmanager
+    def fetch(self, name: str, version, download_fn: Callable[[str], None]) -> Iterator[str]:
+        """
+        Ruta local del artefacto, válida hasta salir del `with` (la entrada no
+        se desaloja mientras tanto). En caso de fallo de caché llama a
+        `download_fn(staging_dir)` para descargarlo y lo incorpora a la caché.
+        """
+        pinned = self._get(name, version)
+        if pinned is not None:
+            logger.info(f" Caché HIT para {name} v{version}: {pinned[0]}")
+        else:
+            logger.info(f" Caché MISS para {name} v{version}, descargando artefacto...")
+            staging = os.path.join(self.root, ".staging", f"{name}-v{version}-{os.getpid()}-{time.time_ns()}")
+            os.makedirs(staging)
+            try:
+                start = time.time()
+                download_fn(staging)
+                logger.info(f" Descarga completada en {time.time() - start:.2f}s")
+                pinned = self._put(name, version, staging)
+            except Exception:
+                shutil.rmtree(staging, ignore_errors=True)
+                raise
+
+        path, lock_file = pinned
+        try:
+            yield path
+        finally:
+            lock_file.close()
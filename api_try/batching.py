@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable, List, Optional, Tuple
+
+import numpy as np
+
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+BATCH_ROWS = REGISTRY.histogram(
+    "batch_size_rows", "Filas por lote enviado al modelo",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024),
+)
+BATCH_SECONDS = REGISTRY.histogram("batch_predict_seconds", "Duración de la llamada vectorizada al modelo")
+
+
+class BatcherSaturated(Exception):
+    """La cola de peticiones pendientes está llena (backpressure)."""
+
+
+class MicroBatcher:
+    """
+    Agrupa peticiones concurrentes en una única llamada vectorizada a
+    `predict_fn`. Se cierra un lote cuando se alcanza `max_batch_size`
+    filas o cuando pasan `max_wait_ms` desde la primera petición del lote.
+
+    `predict_fn` devuelve `(predicciones, versión)` con la versión del modelo
+    que puntuó el lote; `submit` devuelve las filas de la petición junto a esa
+    misma versión (un swap entre el envío y la ejecución no la desfasa).
+
+    Hasta `max_concurrency` lotes se ejecutan a la vez (útil con un backend
+    multiproceso). Si hay `max_queue` peticiones esperando, `submit` lanza
+    BatcherSaturated en lugar de encolar (0 = sin límite).
+    """
+
+    def __init__(
+        self,
+        predict_fn: Callable[[np.ndarray], Tuple[np.ndarray, Any]],
+        max_batch_size: int = 64,
+        max_wait_ms: float = 5.0,
+        executor=None,
+        max_concurrency: int = 1,
+        max_queue: int = 0,
+    ):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.executor = executor
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.max_queue = max(0, int(max_queue))
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._task: Optional[asyncio.Task] = None
+        self._inflight = set()
+
+    async def start(self):
+        if self._task is not None:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f" MicroBatcher iniciado (max_batch_size={self.max_batch_size}, "
+            f"max_wait_ms={self.max_wait * 1000:.1f}, max_concurrency={self.max_concurrency}, "
+            f"max_queue={self.max_queue or 'inf'})"
+        )
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+        # Fallar las peticiones que quedaron encoladas
+        while not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("MicroBatcher detenido"))
+
+    @property
+    def saturated(self) -> bool:
+        """La cola está llena: el siguiente `submit` lanzaría BatcherSaturated"""
+        return self._queue is not None and self.max_queue > 0 and self._queue.full()
+
+    async def submit(self, rows: np.ndarray) -> Tuple[np.ndarray, Any]:
+        """Encola `rows` (2D) y espera sus predicciones y la versión que las generó."""
+        if self._task is None:
+            raise RuntimeError("MicroBatcher no iniciado")
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((rows, future))
+        except asyncio.QueueFull:
+            raise BatcherSaturated(f"{self._queue.qsize()} peticiones en cola")
+        return await future
+
+    async def _collect(self) -> List[Tuple[np.ndarray, asyncio.Future]]:
+        """Espera la primera petición y agrega las que lleguen dentro de la ventana."""
+        items = [await self._queue.get()]
+        n_rows = len(items[0][0])
+        deadline = time.monotonic() + self.max_wait
+
+        while n_rows < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+            except asyncio.TimeoutError:
+                break
+            items.append(item)
+            n_rows += len(item[0])
+
+        return items
+
+    async def _run(self):
+        while True:
+            # No formar el siguiente lote hasta que haya un hueco de ejecución
+            await self._slots.acquire()
+            try:
+                items = await self._collect()
+            except BaseException:
+                self._slots.release()
+                raise
+            items = [(rows, fut) for rows, fut in items if not fut.cancelled()]
+            if not items:
+                self._slots.release()
+                continue
+            task = asyncio.create_task(self._execute(items))
+            self._inflight.add(task)
+            task.add_done_callback(self._inflight.discard)
+
+    async def _execute(self, items: List[Tuple[np.ndarray, asyncio.Future]]):
+        loop = asyncio.get_running_loop()
+        try:
+            batch = items[0][0] if len(items) == 1 else np.vstack([rows for rows, _ in items])
+            BATCH_ROWS.observe(len(batch))
+            start = time.perf_counter()
+            predictions, version = await loop.run_in_executor(self.executor, self.predict_fn, batch)
+            BATCH_SECONDS.observe(time.perf_counter() - start)
+        except Exception as e:
+            for _, fut in items:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+        finally:
+            self._slots.release()
+
+        offset = 0
+        for rows, fut in items:
+            size = len(rows)
+            if not fut.done():
+                fut.set_result((predictions[offset:offset + size], version))
+            offset += size
@@ -0,0 +1,382 @@
+"""
+Artefacto compacto para ensembles de árboles (flavor MLflow `compact_forest`).
+
+En lugar del pickle de sklearn se guardan los arrays de `CompiledForest`
+por columnas, partidos en chunks comprimidos con zstd (o lz4; zlib si no
+hay ninguno instalado). Antes de comprimir:
+
+- Los hijos se guardan como índice local al árbol y los enteros con el
+  dtype más estrecho que los representa (sin pérdida).
+- Los valores de los nodos internos se ponen a 0: `predict` solo lee hojas.
+- Opcionalmente los valores de hoja bajan a float32, solo si las
+  predicciones sobre un conjunto de validación coinciden con el original.
+  Los umbrales ya son float32 exactos (ver `tree_engine._round_down_f32`).
+
+Al cargar, los chunks se leen con `pread` y se descomprimen en paralelo
+(zstd, lz4 y zlib sueltan el GIL) directamente sobre los arrays destino.
+
+Uso:
+    python compact_model.py models:/CarroModel/3 -o ./carro_compact
+    python compact_model.py ./modelo.pkl --register-as CarroModel --alias staging
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import pickle
+import shutil
+import tempfile
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from tree_engine import CompiledForest
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+logger = logging.getLogger(__name__)
+
+FLAVOR = "compact_forest"
+FORMAT_VERSION = 1
+DATA_DIR = "forest"
+MB = 1024 * 1024
+
+
+# --- Codecs ---
+
+def default_codec():
+    if zstandard is not None:
+        return "zstd"
+    if lz4 is not None:
+        return "lz4"
+    return "zlib"
+
+
+def _compress(codec, data):
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=9).compress(data)
+    if codec == "lz4":
+        return lz4.frame.compress(data, compression_level=9)
+    if codec == "zlib":
+        return zlib.compress(data, 6)
+    raise ValueError(f"Codec no soportado: {codec}")
+
+
+def _decompress(codec, data, raw_len):
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("El artefacto usa zstd: instalar `zstandard`")
+        return zstandard.ZstdDecompressor().decompress(data, max_output_size=raw_len)
+    if codec == "lz4":
+        if lz4 is None:
+            raise RuntimeError("El artefacto usa lz4: instalar `lz4`")
+        return lz4.frame.decompress(data)
+    if codec == "zlib":
+        return zlib.decompress(data)
+    raise ValueError(f"Codec no soportado: {codec}")
+
+
+def _narrowest_int(values: np.ndarray):
+    lo, hi = (int(values.min()), int(values.max())) if values.size else (0, 0)
+    for dtype in (np.int8, np.int16, np.int32, np.int64):
+        info = np.iinfo(dtype)
+        if info.min <= lo and hi <= info.max:
+            return dtype
+    return np.int64
+
+
+# --- Escritura ---
+
+def _validation_rows(forest: CompiledForest, n_rows=2000, seed=0):
+    """Filas sintéticas que cubren el rango de umbrales de cada feature."""
+    rng = np.random.default_rng(seed)
+    X = rng.random((n_rows, forest.n_features_in_))
+    is_split = forest.left != np.arange(forest.left.size, dtype=forest.left.dtype).reshape(forest.left.shape)
+    for f in range(forest.n_features_in_):
+        thresholds = forest.threshold[is_split & (forest.feature == f)]
+        if thresholds.size:
+            lo, hi = float(thresholds.min()), float(thresholds.max())
+            span = (hi - lo) or 1.0
+            X[:, f] = lo - 0.1 * span + X[:, f] * 1.2 * span
+    return X
+
+
+def _outputs(forest: CompiledForest, X):
+    """Probabilidades (clasificador) o predicción (regresor): una sola pasada por el ensemble."""
+    return forest.predict_proba(X) if forest.is_classifier else forest.predict(X)
+
+
+def _same_outputs(forest: CompiledForest, reference, candidate, atol=1e-6):
+    if forest.is_classifier and not np.array_equal(reference.argmax(axis=1), candidate.argmax(axis=1)):
+        return False
+    return np.allclose(reference, candidate, rtol=0 if forest.is_classifier else atol, atol=atol)
+
+
+def _leaf_values(forest: CompiledForest):
+    """`value` con los nodos internos a 0 (no afectan a la predicción y comprimen mejor)."""
+    is_leaf = forest.left == np.arange(forest.left.size, dtype=forest.left.dtype).reshape(forest.left.shape)
+    return np.where(is_leaf[..., None], forest.value, 0.0)
+
+
+def _columns(forest: CompiledForest, value_dtype):
+    """Arrays a guardar: nombre -> (array en su dtype de almacenamiento, transformación)."""
+    n_trees, max_nodes = forest.feature.shape
+    offsets = (np.arange(n_trees, dtype=np.int64) * max_nodes)[:, None]
+    left_local = forest.left.astype(np.int64) - offsets
+    right_local = forest.right.astype(np.int64) - offsets
+    columns = {
+        "feature": (forest.feature.astype(_narrowest_int(forest.feature)), None),
+        "threshold": (forest.threshold.astype(np.float32), None),
+        "left": (left_local.astype(_narrowest_int(left_local)), "local_index"),
+        "right": (right_local.astype(_narrowest_int(right_local)), "local_index"),
+        "value": (_leaf_values(forest).astype(value_dtype), None),
+    }
+    if forest.missing_left is not None:
+        columns["missing_left"] = (forest.missing_left.astype(bool), None)
+    return columns
+
+
+def save(model, path, codec=None, chunk_mb=4, downcast=True, X_check=None, workers=None):
+    """
+    Guarda `model` (sklearn o CompiledForest) como artefacto compacto en el
+    directorio `path`. Con `downcast` los valores de hoja pasan a float32 si
+    las predicciones sobre `X_check` (o filas sintéticas) no cambian.
+    Devuelve el manifiesto.
+    """
+    codec = codec or default_codec()
+    original = model
+    forest = model if isinstance(model, CompiledForest) else CompiledForest.from_sklearn(model)
+    if X_check is None:
+        X_check = _validation_rows(forest)
+
+    reference = _outputs(forest, X_check)
+    if not isinstance(original, CompiledForest) and hasattr(original, "predict"):
+        # El compilado debe reproducir al modelo original de sklearn
+        expected = original.predict(X_check)
+        actual = forest.classes_.take(reference.argmax(axis=1)) if forest.is_classifier else reference
+        if not (np.array_equal(expected, actual) if forest.is_classifier else np.allclose(expected, actual)):
+            raise ValueError("El modelo compilado no reproduce las predicciones del original")
+
+    value_dtype = np.float64
+    if downcast:
+        candidate = CompiledForest(
+            forest.feature, forest.threshold, forest.left, forest.right,
+            forest.value.astype(np.float32), forest.max_depth, forest.n_features_in_,
+            classes_=forest.classes_, missing_left=forest.missing_left,
+        )
+        if _same_outputs(forest, reference, _outputs(candidate, X_check)):
+            value_dtype = np.float32
+        else:
+            logger.warning(" float32 cambia predicciones: los valores de hoja se guardan en float64")
+
+    data_dir = os.path.join(path, DATA_DIR)
+    os.makedirs(data_dir, exist_ok=True)
+    chunk_bytes = max(1, int(chunk_mb * MB))
+    columns = _columns(forest, value_dtype)
+
+    # Compresión en paralelo; el orden de escritura es fijo
+    jobs = []
+    for name, (array, _) in columns.items():
+        raw = np.ascontiguousarray(array).view(np.uint8).ravel()
+        for start in range(0, max(raw.size, 1), chunk_bytes):
+            jobs.append((name, start, raw[start:start + chunk_bytes]))
+
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        compressed = list(pool.map(lambda job: _compress(codec, job[2].tobytes()), jobs))
+
+    manifest = {
+        "format_version": FORMAT_VERSION,
+        "codec": codec,
+        "max_depth": int(forest.max_depth),
+        "n_features_in_": int(forest.n_features_in_),
+        "classes": forest.classes_.tolist() if forest.classes_ is not None else None,
+        "classes_dtype": str(forest.classes_.dtype) if forest.classes_ is not None else None,
+        "arrays": {
+            name: {"dtype": str(array.dtype), "shape": list(array.shape), "transform": transform, "chunks": []}
+            for name, (array, transform) in columns.items()
+        },
+    }
+    digest = hashlib.sha256()
+    offset = 0
+    with open(os.path.join(data_dir, "arrays.bin"), "wb") as f:
+        for (name, start, raw), blob in zip(jobs, compressed):
+            f.write(blob)
+            digest.update(blob)
+            manifest["arrays"][name]["chunks"].append([offset, len(blob), start, int(raw.size)])
+            offset += len(blob)
+    manifest["sha256"] = digest.hexdigest()
+    manifest["compressed_bytes"] = offset
+    manifest["raw_bytes"] = int(sum(a.nbytes for a, _ in columns.values()))
+
+    with open(os.path.join(data_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+    from mlflow.models import Model
+
+    mlmodel = Model()
+    mlmodel.add_flavor(FLAVOR, data=DATA_DIR, codec=codec, format_version=FORMAT_VERSION)
+    mlmodel.save(os.path.join(path, "MLmodel"))
+
+    logger.info(
+        f" Artefacto compacto ({codec}, valores {np.dtype(value_dtype).name}): "
+        f"{manifest['raw_bytes'] / 1e6:.1f} MB -> {offset / 1e6:.1f} MB"
+    )
+    return manifest
+
+
+# --- Lectura ---
+
+def _file_sha256(fd, size, block=8 * MB):
+    digest = hashlib.sha256()
+    for offset in range(0, size, block):
+        digest.update(os.pread(fd, min(block, size - offset), offset))
+    return digest.hexdigest()
+
+
+def load(path, workers=None) -> CompiledForest:
+    """
+    Carga un artefacto compacto local descomprimiendo los chunks en paralelo.
+    El sha256 del manifiesto se comprueba a la vez, en otro hilo del pool.
+    """
+    data_dir = os.path.join(path, DATA_DIR)
+    with open(os.path.join(data_dir, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest["format_version"] > FORMAT_VERSION:
+        raise ValueError(f"Versión de formato no soportada: {manifest['format_version']}")
+    codec = manifest["codec"]
+
+    arrays, jobs = {}, []
+    for name, spec in manifest["arrays"].items():
+        array = np.empty(spec["shape"], dtype=np.dtype(spec["dtype"]))
+        arrays[name] = array
+        raw = array.view(np.uint8).ravel() if array.size else None
+        for offset, length, start, raw_len in spec["chunks"]:
+            if raw_len:
+                jobs.append((raw, offset, length, start, raw_len))
+
+    fd = os.open(os.path.join(data_dir, "arrays.bin"), os.O_RDONLY)
+    try:
+        def work(job):
+            raw, offset, length, start, raw_len = job
+            try:
+                data = _decompress(codec, os.pread(fd, length, offset), raw_len)
+            except Exception as e:
+                raise ValueError(f"Chunk corrupto en offset {offset}: {e}") from e
+            if len(data) != raw_len:
+                raise ValueError(f"Chunk corrupto en offset {offset}")
+            raw[start:start + raw_len] = np.frombuffer(data, dtype=np.uint8)
+
+        expected = manifest.get("sha256")
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+            checksum = pool.submit(_file_sha256, fd, os.fstat(fd).st_size) if expected else None
+            list(pool.map(work, jobs))
+            if checksum is not None and checksum.result() != expected:
+                raise ValueError(f"sha256 de arrays.bin no coincide con el manifiesto ({path})")
+    finally:
+        os.close(fd)
+
+    n_trees, max_nodes = arrays["feature"].shape
+    offsets = (np.arange(n_trees, dtype=np.int32) * max_nodes)[:, None]
+    for name in ("left", "right"):
+        arrays[name] = arrays[name].astype(np.int32) + offsets
+
+    classes = manifest["classes"]
+    return CompiledForest(
+        feature=arrays["feature"].astype(np.int32),
+        threshold=arrays["threshold"],
+        left=arrays["left"],
+        right=arrays["right"],
+        value=arrays["value"],
+        max_depth=manifest["max_depth"],
+        n_features_in_=manifest["n_features_in_"],
+        classes_=np.asarray(classes, dtype=manifest["classes_dtype"]) if classes is not None else None,
+        missing_left=arrays.get("missing_left"),
+    )
+
+
+def is_compact(path) -> bool:
+    """True si `path` (directorio local o URI de MLflow) es un artefacto compacto."""
+    if os.path.isdir(path):
+        return os.path.exists(os.path.join(path, DATA_DIR, "manifest.json"))
+    from mlflow.models import get_model_info
+
+    return FLAVOR in get_model_info(path).flavors
+
+
+def load_model(uri, workers=None):
+    """
+    Carga `uri` (directorio local o URI de MLflow): artefacto compacto si lo
+    es, si no el pickle con `mlflow.sklearn.load_model`.
+    """
+    import mlflow.artifacts
+    import mlflow.sklearn
+
+    if not is_compact(uri):
+        return mlflow.sklearn.load_model(uri)
+    if os.path.isdir(uri):
+        return load(uri, workers=workers)
+    tmp = tempfile.mkdtemp(prefix="compact-")
+    try:
+        return load(mlflow.artifacts.download_artifacts(artifact_uri=uri, dst_path=tmp), workers=workers)
+    finally:
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+# --- CLI ---
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Convierte un modelo de árboles al artefacto compacto")
+    parser.add_argument("source", help="URI de MLflow (models:/..., runs:/...) o fichero .pkl")
+    parser.add_argument("-o", "--output", help="Directorio de salida")
+    parser.add_argument("--register-as", help="Registra el artefacto como nueva versión de este modelo")
+    parser.add_argument("--alias", help="Alias para la versión registrada")
+    parser.add_argument("--codec", choices=["zstd", "lz4", "zlib"], default=None)
+    parser.add_argument("--chunk-mb", type=float, default=4)
+    parser.add_argument("--no-downcast", action="store_true", help="Mantener los valores de hoja en float64")
+    args = parser.parse_args(argv)
+    if not args.output and not args.register_as:
+        parser.error("indicar --output y/o --register-as")
+
+    import mlflow
+    import mlflow.sklearn
+
+    if os.path.isfile(args.source):
+        with open(args.source, "rb") as f:
+            model = pickle.load(f)
+    else:
+        model = mlflow.sklearn.load_model(args.source)
+
+    output = args.output or tempfile.mkdtemp(prefix="compact-")
+    start = time.time()
+    manifest = save(model, output, codec=args.codec, chunk_mb=args.chunk_mb, downcast=not args.no_downcast)
+    logger.info(f" Guardado en {output} ({time.time() - start:.1f}s)")
+
+    if args.register_as:
+        from mlflow import MlflowClient
+
+        with mlflow.start_run(run_name="Artefacto compacto") as run:
+            mlflow.log_artifacts(output, artifact_path="model")
+            mlflow.log_params({"source": args.source, "codec": manifest["codec"]})
+            mlflow.log_metrics({"raw_bytes": manifest["raw_bytes"], "compressed_bytes": manifest["compressed_bytes"]})
+        version = mlflow.register_model(f"runs:/{run.info.run_id}/model", args.register_as)
+        if args.alias:
+            MlflowClient().set_registered_model_alias(args.register_as, args.alias, version.version)
+        logger.info(f" Registrado como {args.register_as} v{version.version}")
+        if not args.output:
+            shutil.rmtree(output, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+Drenado de la réplica para los despliegues rolling del watcher.
+
+Mientras drena, la réplica responde 503 en /ready y rechaza con 503 las
+peticiones de tráfico nuevas, sin procesarlas: nginx
+(`proxy_next_upstream http_503`) las reintenta en otra réplica. Las que ya
+estaban en curso terminan con normalidad; `wait_idle` espera a que acaben.
+POST /predict/stream es la excepción: nginx no guarda el cuerpo y no puede
+reintentarlo, así que el 503 llega al cliente (ver nginx.conf).
+"""
+
+import json
+import threading
+import time
+from typing import Callable, Optional
+
+
+class DrainGate:
+    """Cuenta las peticiones de tráfico en curso y las bloquea al drenar"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._inflight = 0
+        self._rejected = 0
+        self.draining = False
+        self.since: Optional[float] = None
+
+    def try_enter(self) -> bool:
+        with self._lock:
+            if self.draining:
+                self._rejected += 1
+                return False
+            self._inflight += 1
+            return True
+
+    def exit(self):
+        with self._lock:
+            self._inflight -= 1
+            if self._inflight == 0:
+                self._idle.notify_all()
+
+    def start(self):
+        with self._lock:
+            if not self.draining:
+                self.draining = True
+                self.since = time.time()
+                self._rejected = 0
+
+    def stop(self):
+        with self._lock:
+            self.draining = False
+            self.since = None
+
+    def wait_idle(self, timeout: float) -> bool:
+        """True si no queda ninguna petición en curso antes de `timeout` segundos"""
+        with self._lock:
+            return self._idle.wait_for(lambda: self._inflight == 0, timeout=timeout)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "draining": self.draining,
+                "inflight": self._inflight,
+                "rejected": self._rejected,
+                "draining_s": round(time.time() - self.since, 3) if self.since is not None else None,
+            }
+
+
+class DrainMiddleware:
+    """
+    Middleware ASGI: cuenta hasta que la respuesta termina de enviarse (también
+    en streaming), cosa que un `BaseHTTPMiddleware` no permite.
+    """
+
+    def __init__(self, app, gate: DrainGate, is_traffic: Callable[[str], bool]):
+        self.app = app
+        self.gate = gate
+        self.is_traffic = is_traffic
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.is_traffic(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        if not self.gate.try_enter():
+            body = json.dumps({"detail": "Réplica drenando, reintentar en otra"}).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 503,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"retry-after", b"1"),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.gate.exit()
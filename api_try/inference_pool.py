@@ -0,0 +1,111 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import mmap_models
+
+logger = logging.getLogger(__name__)
+
+# Modelo del proceso worker (cargado una vez en el initializer)
+_worker_model = None
+
+# Atributos del estimador que la API lee en el proceso principal
+METADATA_ATTRS = ("n_features_in_", "classes_", "n_outputs_", "feature_names_in_")
+
+
+def _init_worker(snapshot_path):
+    global _worker_model
+    _worker_model = mmap_models.load_snapshot(snapshot_path)
+
+
+def _worker_predict(X):
+    return _worker_model.predict(X)
+
+
+def _worker_ping():
+    return os.getpid()
+
+
+def _worker_metadata():
+    return {name: getattr(_worker_model, name) for name in METADATA_ATTRS if hasattr(_worker_model, name)}
+
+
+class PooledModel:
+    """
+    Modelo servido por un pool de procesos para salir del GIL.
+
+    Cada worker abre el mismo snapshot joblib con `mmap_mode='r'`, por lo
+    que los arrays del modelo se comparten entre procesos (solo con el motor
+    compilado: el Tree de sklearn copia sus nodos en cada worker). El proceso
+    principal no carga el modelo: guarda solo los atributos que lee la API
+    (`n_features_in_`, `classes_`...), pedidos a un worker.
+
+    Si un worker muere (OOM, segfault) el pool queda roto; `predict` lo
+    recrea y reintenta una vez. `close()` apaga el pool tras terminar el
+    trabajo pendiente (ModelHolder lo llama cuando el modelo retirado se drena).
+    """
+
+    def __init__(self, snapshot_path: str, workers: int):
+        self.snapshot_path = snapshot_path
+        self.workers = workers
+        self._lock = threading.Lock()
+        self._closed = False
+        self._pool = self._new_pool()
+        self._warm_up()
+        self._metadata = self._pool.submit(_worker_metadata).result()
+
+    def _new_pool(self):
+        # spawn: el proceso de uvicorn tiene threads, fork no es seguro
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.snapshot_path,),
+        )
+
+    def _warm_up(self):
+        """Espera a que el pool arranque y responda antes de publicar el modelo."""
+        start = time.time()
+        futures = [self._pool.submit(_worker_ping) for _ in range(self.workers)]
+        wait(futures)
+        pids = {f.result() for f in futures}
+        logger.info(
+            f" Pool de inferencia listo: {self.workers} workers, {len(pids)} ya respondiendo "
+            f"({time.time() - start:.2f}s)"
+        )
+
+    def __getattr__(self, name):
+        # Atributos del estimador (n_features_in_, classes_...) leídos de un worker
+        if name.startswith("_"):
+            raise AttributeError(name)
+        try:
+            return self._metadata[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def _restart(self, broken):
+        """Sustituye el pool roto (solo una vez aunque fallen varias peticiones a la vez)"""
+        with self._lock:
+            if self._pool is not broken or self._closed:
+                return
+            logger.error(f" Pool de inferencia roto (worker caído): se recrea ({self.snapshot_path})")
+            broken.shutdown(wait=False)
+            self._pool = self._new_pool()
+
+    def predict(self, X):
+        pool = self._pool
+        try:
+            return pool.submit(_worker_predict, X).result()
+        except BrokenProcessPool:
+            self._restart(pool)
+            return self._pool.submit(_worker_predict, X).result()
+
+    def close(self):
+        logger.info(f" Apagando pool de inferencia ({self.snapshot_path})")
+        with self._lock:
+            self._closed = True
+            self._pool.shutdown(wait=False)
@@ -0,0 +1,159 @@
+"""
+Logging no bloqueante para la API.
+
+Los handlers reales (formateo y escritura en stderr) corren en un thread
+aparte (`QueueListener`); en el camino de la petición solo se filtra el
+registro y se encola. Si la cola se llena, los registros se descartan en
+lugar de bloquear la petición.
+
+Muestreo por ruta: durante una petición cuya ruta empieza por uno de los
+prefijos de `sample_rates` solo se conserva esa fracción de los registros
+INFO/DEBUG (incluido el access log de uvicorn). WARNING y superiores pasan
+siempre. La ruta se conoce a través de `RequestPathMiddleware`.
+"""
+
+import logging
+import logging.handlers
+import queue
+import random
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional
+
+# Ruta de la petición en curso (None fuera de una petición)
+current_path: ContextVar[Optional[str]] = ContextVar("current_path", default=None)
+
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """'/predict=0.01,/models/=0.1' -> {'/predict': 0.01, '/models/': 0.1}"""
+    rates = {}
+    for item in filter(None, (i.strip() for i in spec.split(","))):
+        prefix, _, rate = item.partition("=")
+        rates[prefix.strip()] = min(1.0, max(0.0, float(rate)))
+    return rates
+
+
+class PathSampler(logging.Filter):
+    """Conserva una fracción de los registros INFO/DEBUG emitidos en cada ruta"""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        # El prefijo más largo gana
+        self.rates = sorted(rates.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def rate_for(self, path: str) -> float:
+        for prefix, rate in self.rates:
+            if path.startswith(prefix):
+                return rate
+        return 1.0
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING or not self.rates:
+            return True
+        path = current_path.get()
+        if path is None:
+            return True
+        rate = self.rate_for(path)
+        return rate >= 1.0 or random.random() < rate
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler que descarta (y cuenta) en lugar de bloquear con la cola llena"""
+
+    def __init__(self, q, on_drop: Optional[Callable[[], None]] = None):
+        super().__init__(q)
+        self.dropped = 0
+        self.on_drop = on_drop
+
+    def prepare(self, record):
+        # Cola dentro del proceso: el registro se formatea en el listener con los
+        # formatters originales (el access log de uvicorn necesita `args` intactos)
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            if self.on_drop is not None:
+                self.on_drop()
+
+
+class _Listener(logging.handlers.QueueListener):
+    """QueueListener que recuerda a qué logger sustituyó los handlers"""
+
+    def __init__(self, q, handlers, logger, queue_handler):
+        super().__init__(q, *handlers, respect_handler_level=True)
+        self.logger = logger
+        self.queue_handler = queue_handler
+
+
+def route_through_queue(logger: logging.Logger, sampler: logging.Filter, queue_size: int,
+                        on_drop=None) -> Optional[_Listener]:
+    """
+    Sustituye los handlers de `logger` por un único handler de cola; los
+    originales pasan a un `QueueListener` (conservan su formato y nivel).
+    """
+    handlers = [h for h in logger.handlers if not isinstance(h, logging.handlers.QueueHandler)]
+    if not handlers:
+        return None
+    q = queue.Queue(maxsize=queue_size)
+    queue_handler = DroppingQueueHandler(q, on_drop=on_drop)
+    queue_handler.addFilter(sampler)
+    for handler in handlers:
+        logger.removeHandler(handler)
+    logger.addHandler(queue_handler)
+    listener = _Listener(q, handlers, logger, queue_handler)
+    listener.start()
+    return listener
+
+
+def setup_logging(level: str, fmt: str, sample_rates: Dict[str, float], queue_size: int = 10000,
+                  loggers=("uvicorn", "uvicorn.error", "uvicorn.access"),
+                  on_drop=None) -> List[_Listener]:
+    """
+    Configura el root logger con `fmt` y pasa por cola tanto el root como
+    los loggers de uvicorn que tengan handlers propios. Devuelve los
+    listeners (hay que pararlos al apagar para vaciar las colas).
+    """
+    root = logging.getLogger()
+    root.setLevel(level)
+    if any(isinstance(h, DroppingQueueHandler) for h in root.handlers):
+        return []  # ya configurado
+    if not root.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(fmt))
+        root.addHandler(handler)
+
+    sampler = PathSampler(sample_rates)
+    listeners = []
+    for lg in (root, *(logging.getLogger(name) for name in loggers)):
+        listener = route_through_queue(lg, sampler, queue_size, on_drop=on_drop)
+        if listener is not None:
+            listeners.append(listener)
+    return listeners
+
+
+def stop_logging(listeners: List[_Listener]):
+    """Vacía las colas y devuelve los handlers originales a sus loggers"""
+    for listener in listeners:
+        listener.stop()
+        listener.logger.removeHandler(listener.queue_handler)
+        for handler in listener.handlers:
+            listener.logger.addHandler(handler)
+
+
+class RequestPathMiddleware:
+    """Middleware ASGI que expone la ruta de la petición en `current_path`"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = current_path.set(scope["path"])
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_path.reset(token)
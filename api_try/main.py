@@ -1,13 +1,55 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from pydantic import BaseModel
+from typing import List, Optional
+from contextlib import ExitStack, contextmanager, nullcontext
+import numpy as np
+import boto3
+from botocore.client import Config
+import requests
 import mlflow.sklearn
+import mlflow.artifacts
 import os
+import shutil
+import asyncio
 import logging
+import threading
+import time
+import functools
 from mlflow import MlflowClient
 
-# Configurar logging detallado
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+from batching import MicroBatcher, BatcherSaturated
+from model_store import ModelHolder
+from model_cache import ModelCache
+import mmap_models
+from artifact_cache import ArtifactCache
+import s3_download
+import compact_model
+from registry_cache import RegistryCache
+from tree_engine import CompiledForest
+from inference_pool import PooledModel
+import streaming
+from result_cache import ResultCache
+from startup import StartupTracker
+from draining import DrainGate, DrainMiddleware
+from profiling import StackProfiler, ProfileMiddleware
+import log_queue
+import metrics
+from metrics import REGISTRY
+
+# Logging por cola: formateo y escritura en un thread aparte. En las rutas de
+# LOG_SAMPLE_RATES solo se conserva esa fracción de los INFO/DEBUG (p.ej.
+# "/predict=0.01,/models/=0.05"); WARNING y superiores siempre
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_SAMPLE_RATES = log_queue.parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", ""))
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+LOG_DROPPED = REGISTRY.counter("log_records_dropped_total", "Registros de log descartados con la cola llena")
+log_listeners = log_queue.setup_logging(
+    LOG_LEVEL,
+    '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    LOG_SAMPLE_RATES,
+    queue_size=LOG_QUEUE_SIZE,
+    on_drop=LOG_DROPPED.inc,
 )
 logger = logging.getLogger(__name__)
 
@@ -19,126 +61,521 @@ logging.getLogger('urllib3').setLevel(logging.WARNING)
 
 app = FastAPI(title="MLOps Toy API")
 
-MODEL_NAME = "CarroModel"
-MODEL_URI = f"models:/{MODEL_NAME}@production"
+MODEL_NAME = os.getenv("MODEL_NAME", "CarroModel")
+MODEL_ALIAS = os.getenv("MODEL_ALIAS", "production")
+MODEL_URI = f"models:/{MODEL_NAME}@{MODEL_ALIAS}"
+
+# Modo de carga: "pickle" (copia privada por proceso) o "mmap" (arrays
+# compartidos entre workers de uvicorn a través de un snapshot en disco).
+# mmap solo comparte con INFERENCE_ENGINE=compiled: el Tree de sklearn copia
+# sus nodos al deserializar y el modelo quedaría dos veces en RAM
+MODEL_LOAD_MODE = os.getenv("MODEL_LOAD_MODE", "pickle")
+MODEL_MMAP_DIR = os.getenv("MODEL_MMAP_DIR", "/dev/shm/models")
+
+# Motor de inferencia: "sklearn" (estimador original) o "compiled" (ensembles
+# de árboles compilados a arrays planos; mismo resultado, menos overhead)
+INFERENCE_ENGINE = os.getenv("INFERENCE_ENGINE", "sklearn")
+if MODEL_LOAD_MODE == "mmap" and INFERENCE_ENGINE != "compiled":
+    logger.warning(
+        f" MODEL_LOAD_MODE=mmap no comparte nada con el motor {INFERENCE_ENGINE} "
+        "(sklearn copia los nodos del Tree): se carga en modo pickle"
+    )
+    MODEL_LOAD_MODE = "pickle"
+
+# Backend de inferencia: "thread" (en este proceso) o "process" (pool de
+# procesos que mapean el mismo snapshot; escala en varios cores)
+INFERENCE_BACKEND = os.getenv("INFERENCE_BACKEND", "thread")
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", str(os.cpu_count() or 1)))
+# Peticiones en espera antes de responder 429 (0 = sin límite)
+INFERENCE_QUEUE_SIZE = int(os.getenv("INFERENCE_QUEUE_SIZE", "1000"))
+if INFERENCE_BACKEND == "process" and INFERENCE_ENGINE != "compiled":
+    logger.warning(
+        f" INFERENCE_BACKEND=process con el motor {INFERENCE_ENGINE}: cada uno de los "
+        f"{INFERENCE_WORKERS} workers tendrá su propia copia del modelo (el Tree de sklearn "
+        "no se comparte). Usar INFERENCE_ENGINE=compiled para compartir los arrays"
+    )
+# Threads para descomprimir artefactos `compact_forest` (0 = uno por core)
+COMPACT_LOAD_WORKERS = int(os.getenv("COMPACT_LOAD_WORKERS", "0"))
+
+# Caché local de artefactos por versión (vacío = desactivada)
+ARTIFACT_CACHE_DIR = os.getenv("ARTIFACT_CACHE_DIR", "")
+ARTIFACT_CACHE_MAX_GB = float(os.getenv("ARTIFACT_CACHE_MAX_GB", "20"))
+ARTIFACT_CACHE_VERIFY = os.getenv("ARTIFACT_CACHE_VERIFY", "size")  # size | full
+
+artifact_cache = (
+    ArtifactCache(ARTIFACT_CACHE_DIR, int(ARTIFACT_CACHE_MAX_GB * 1e9), verify=ARTIFACT_CACHE_VERIFY)
+    if ARTIFACT_CACHE_DIR else None
+)
+
+# Descarga paralela por rangos desde S3/MinIO en caso de fallo de caché
+S3_DOWNLOAD_CONCURRENCY = int(os.getenv("S3_DOWNLOAD_CONCURRENCY", "16"))
+S3_DOWNLOAD_CHUNK_MB = int(os.getenv("S3_DOWNLOAD_CHUNK_MB", "64"))
+
+# TTL de la caché de metadata del registro usada por GET /
+REGISTRY_CACHE_TTL_S = float(os.getenv("REGISTRY_CACHE_TTL_S", "30"))
+
+registry_cache = RegistryCache(
+    lambda name, alias: MlflowClient().get_model_version_by_alias(name, alias),
+    ttl_s=REGISTRY_CACHE_TTL_S,
+)
+
+# Caché LRU de predicciones por fila (0 entradas = desactivada)
+RESULT_CACHE_ENTRIES = int(os.getenv("RESULT_CACHE_ENTRIES", "0"))
+RESULT_CACHE_MAX_MB = float(os.getenv("RESULT_CACHE_MAX_MB", "256"))
+
+result_cache = (
+    ResultCache(RESULT_CACHE_ENTRIES, int(RESULT_CACHE_MAX_MB * 1e6))
+    if RESULT_CACHE_ENTRIES > 0 else None
+)
+
+# Filas por chunk en POST /predict/stream
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "1024"))
+STREAM_MAX_LINE_BYTES = int(os.getenv("STREAM_MAX_LINE_BYTES", str(streaming.MAX_LINE_BYTES)))
+
+# Caché multi-modelo (POST /models/{name}/{alias}/predict): presupuesto de
+# memoria y modelos fijados que nunca se desalojan ("name@alias,...")
+MODEL_CACHE_MAX_GB = float(os.getenv("MODEL_CACHE_MAX_GB", "8"))
+MODEL_CACHE_PINNED = [m.strip() for m in os.getenv("MODEL_CACHE_PINNED", "").split(",") if m.strip()]
+
+# Micro-batching: tamaño máximo de lote (filas) y espera máxima para completarlo
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "256"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "5"))
+
+# Calentamiento tras un swap (POST /admin/warmup): filas sintéticas por lote
+WARMUP_ROWS = int(os.getenv("WARMUP_ROWS", "256"))
+
+# Perfilado muestreado de las rutas de predicción (GET /admin/profile). 0 =
+# desactivado; se activa en caliente con POST /admin/profile
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+# Permite forzar el perfilado de una petición con la cabecera `X-Profile: 1`
+PROFILE_ALLOW_HEADER = os.getenv("PROFILE_ALLOW_HEADER", "false").lower() == "true"
+
+# Modelo en servicio; se sustituye en caliente con POST /admin/reload
+holder = ModelHolder()
+# Progreso del arranque en segundo plano (expuesto en /ready)
+startup = StartupTracker()
+
+
+def is_traffic_path(path):
+    """
+    Rutas de predicción (drenado y perfilado); admin, probes y métricas
+    siguen respondiendo al drenar
+    """
+    return path.startswith("/predict") or (path.startswith("/models/") and path.endswith("/predict"))
+
+
+# Drenado para despliegues rolling (POST/DELETE /admin/drain)
+drain = DrainGate()
+# Perfilado muestreado (GET/POST/DELETE /admin/profile)
+profiler = StackProfiler(rate=PROFILE_SAMPLE_RATE, interval=PROFILE_INTERVAL_MS / 1000)
+
+# El último middleware añadido es el más externo
+app.add_middleware(ProfileMiddleware, profiler=profiler, is_target=is_traffic_path, allow_header=PROFILE_ALLOW_HEADER)
+app.add_middleware(DrainMiddleware, gate=drain, is_traffic=is_traffic_path)
+app.add_middleware(log_queue.RequestPathMiddleware)
+
+
+# Métricas (GET /metrics). Contadores por thread: sin locks en el hot path
+PREDICT_SECONDS = REGISTRY.histogram("predict_latency_seconds", "Latencia de las peticiones de predicción", ["endpoint"])
+PREDICT_REQUESTS = REGISTRY.counter("predict_requests_total", "Peticiones de predicción por código de respuesta", ["endpoint", "code"])
+PREDICT_INFLIGHT = REGISTRY.gauge("predict_inflight_requests", "Peticiones de predicción en curso")
+MODEL_LOADS = REGISTRY.counter("model_loads_total", "Modelos cargados", ["model"])
+MODEL_LOAD_SECONDS = REGISTRY.gauge("model_load_duration_seconds", "Duración de la última carga del modelo", ["model"])
+DOWNLOAD_BYTES = REGISTRY.counter("artifact_download_bytes_total", "Bytes de artefactos descargados del almacén")
+REGISTRY.gauge_fn("model_serving_version", "Versión del modelo principal en servicio",
+                  lambda: float(holder.version) if holder.version is not None else None)
+REGISTRY.gauge_fn("model_cache_bytes", "Memoria estimada de los modelos de la caché multi-modelo",
+                  lambda: model_cache.stats()["used_bytes"])
+REGISTRY.gauge_fn("result_cache_hit_ratio", "Ratio de aciertos de la caché de resultados",
+                  lambda: result_cache.stats()["hit_ratio"] if result_cache is not None else None)
+
+
+def track_predict(endpoint):
+    """Latencia, código de respuesta y peticiones en curso de un endpoint de predicción"""
+    latency = PREDICT_SECONDS.labels(endpoint)
+
+    def decorator(handler):
+        @functools.wraps(handler)
+        async def wrapper(*args, **kwargs):
+            PREDICT_INFLIGHT.inc()
+            start = time.perf_counter()
+            code = 500
+            try:
+                response = await handler(*args, **kwargs)
+                code = 200
+                return response
+            except HTTPException as e:
+                code = e.status_code
+                raise
+            finally:
+                latency.observe(time.perf_counter() - start)
+                PREDICT_REQUESTS.labels(endpoint, str(code)).inc()
+                PREDICT_INFLIGHT.dec()
+        return wrapper
+    return decorator
+
+
+class PredictRequest(BaseModel):
+    instances: List[List[float]]
+
+
+def _predict_batch(X):
+    """
+    Llamada vectorizada al modelo (se ejecuta en el thread pool del batcher).
+    Devuelve `(predicciones, versión)` de la versión que realmente puntuó.
+    """
+    return holder.predict(X)
+
+
+batcher = MicroBatcher(
+    _predict_batch,
+    max_batch_size=BATCH_MAX_SIZE,
+    max_wait_ms=BATCH_MAX_WAIT_MS,
+    max_concurrency=INFERENCE_WORKERS if INFERENCE_BACKEND == "process" else 1,
+    max_queue=INFERENCE_QUEUE_SIZE,
+)
+
+
+async def cached_predict(X):
+    """
+    Predicción con la caché de resultados delante: solo las filas que no
+    están en caché (para la versión en servicio) llegan al batcher. Las
+    escrituras usan la versión que devolvió el batcher: si hubo un swap
+    mientras tanto, las predicciones nuevas no se guardan con la versión vieja.
+    Devuelve `(predicciones, versión)`.
+    """
+    if result_cache is None:
+        predictions, version = await batcher.submit(X)
+        return predictions.tolist(), version
+
+    version = holder.version
+    results, missing = result_cache.lookup(X, version)
+    if missing:
+        X_missing = X[missing]
+        predictions, version = await batcher.submit(X_missing)
+        result_cache.store(X_missing, predictions, version)
+        for i, pred in zip(missing, predictions.tolist()):
+            results[i] = pred
+    return [r.item() if hasattr(r, "item") else r for r in results], version
 
-model = None
 
 @app.on_event("startup")
-async def load_model():
-    global model
-    
-    # ✅ Verificar variables de entorno
-    logger.info("=" * 60)
-    logger.info("🔧 Configuración de Entorno:")
-    logger.info(f"  MLFLOW_TRACKING_URI: {os.getenv('MLFLOW_TRACKING_URI')}")
-    logger.info(f"  MLFLOW_S3_ENDPOINT_URL: {os.getenv('MLFLOW_S3_ENDPOINT_URL')}")
-    logger.info(f"  AWS_ACCESS_KEY_ID: {os.getenv('AWS_ACCESS_KEY_ID')}")
-    logger.info(f"  AWS_DEFAULT_REGION: {os.getenv('AWS_DEFAULT_REGION')}")
-    logger.info("=" * 60)
-    
-    #  Test 1: Verificar conectividad con MLflow Server
-    try:
-        import requests
-        mlflow_url = os.getenv("MLFLOW_TRACKING_URI")
-        health_resp = requests.get(f"{mlflow_url}/health", timeout=5)
-        logger.info(f" MLflow Server Health: {health_resp.status_code}")
-    except Exception as e:
-        logger.error(f" MLflow Server no responde: {e}")
+async def start_batcher():
+    await batcher.start()
+
+
+@app.on_event("shutdown")
+async def stop_batcher():
+    await batcher.stop()
+
+
+@app.on_event("shutdown")
+def flush_logs():
+    log_queue.stop_logging(log_listeners)
+
+def make_s3_client(max_pool_connections=10):
+    """Cliente S3 apuntando a MinIO (thread-safe, reutilizable entre threads)"""
+    return boto3.client(
+        's3',
+        endpoint_url=os.getenv('MLFLOW_S3_ENDPOINT_URL'),
+        aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
+        aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
+        region_name=os.getenv('AWS_DEFAULT_REGION', 'us-east-1'),
+        config=Config(signature_version='s3v4', max_pool_connections=max_pool_connections),
+        verify=False  # Desactivar SSL
+    )
+
+
+def download_model_artifact(source, dst_dir):
+    """Descarga el artefacto `source` dejando sus ficheros directamente en `dst_dir`"""
+    if source.startswith("s3://"):
+        DOWNLOAD_BYTES.inc(s3_download.download_prefix(
+            make_s3_client(max_pool_connections=S3_DOWNLOAD_CONCURRENCY),
+            source,
+            dst_dir,
+            concurrency=S3_DOWNLOAD_CONCURRENCY,
+            chunk_size=S3_DOWNLOAD_CHUNK_MB * s3_download.MB,
+        ))
         return
-    
-    #  Test 2: Verificar conectividad con MinIO
+
+    local_path = mlflow.artifacts.download_artifacts(artifact_uri=source, dst_path=dst_dir)
+    if os.path.abspath(local_path) != os.path.abspath(dst_dir):
+        for name in os.listdir(local_path):
+            shutil.move(os.path.join(local_path, name), os.path.join(dst_dir, name))
+        shutil.rmtree(local_path, ignore_errors=True)
+    DOWNLOAD_BYTES.inc(sum(
+        os.path.getsize(os.path.join(root, f)) for root, _, files in os.walk(dst_dir) for f in files
+    ))
+
+
+@contextmanager
+def resolve_model_path(model_version):
+    """
+    URI desde la que cargar la versión: ruta local cacheada o el registro. La
+    ruta cacheada no se desaloja hasta salir del `with`.
+    """
+    if artifact_cache is None:
+        yield f"models:/{model_version.name}/{model_version.version}"
+        return
+    # URI física del artefacto (s3://...) aunque `source` sea runs:/ o models:/
+    download_uri = MlflowClient().get_model_version_download_uri(model_version.name, model_version.version)
+    with artifact_cache.fetch(
+        model_version.name,
+        model_version.version,
+        lambda dst: download_model_artifact(download_uri, dst),
+    ) as path:
+        yield path
+
+
+def prepare_model(loaded):
+    """Aplica el motor de inferencia configurado al modelo recién cargado"""
+    if INFERENCE_ENGINE != "compiled" or isinstance(loaded, CompiledForest):
+        # Los artefactos `compact_forest` ya llegan compilados
+        return loaded
     try:
-        import boto3
-        from botocore.client import Config
-        
-        s3_client = boto3.client(
-            's3',
-            endpoint_url=os.getenv('MLFLOW_S3_ENDPOINT_URL'),
-            aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-            aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY'),
-            region_name=os.getenv('AWS_DEFAULT_REGION', 'us-east-1'),
-            config=Config(signature_version='s3v4'),
-            verify=False  # Desactivar SSL
-        )
-        
-        buckets = s3_client.list_buckets()
-        logger.info(f" MinIO accesible. Buckets: {[b['Name'] for b in buckets['Buckets']]}")
-        
-        # Listar objetos en el bucket mlflow
-        try:
-            objects = s3_client.list_objects_v2(Bucket='mlflow', MaxKeys=5)
-            if 'Contents' in objects:
-                logger.info(f" Archivos en bucket 'mlflow': {len(objects['Contents'])} objetos")
-                for obj in objects.get('Contents', [])[:3]:
-                    logger.info(f"   - {obj['Key']}")
-            else:
-                logger.warning("  Bucket 'mlflow' está vacío")
-        except Exception as list_err:
-            logger.error(f" Error listando bucket: {list_err}")
-            
+        return CompiledForest.from_sklearn(loaded)
+    except ValueError as e:
+        logger.warning(f" Motor compilado no aplicable, se usa sklearn: {e}")
+        return loaded
+
+
+def _phase(tracker, name):
+    """Fase cronometrada del arranque (no-op fuera del arranque)"""
+    return tracker.phase(name) if tracker is not None else nullcontext()
+
+
+def load_model_version(model_version, tracker=None):
+    with ExitStack() as stack:
+        with _phase(tracker, "download"):
+            path = stack.enter_context(resolve_model_path(model_version))
+        with _phase(tracker, "deserialize"):
+            loaded = compact_model.load_model(path, workers=COMPACT_LOAD_WORKERS or None)
+    with _phase(tracker, "prepare"):
+        return prepare_model(loaded)
+
+
+def fetch_model(name, alias, pooled=True, tracker=None):
+    """
+    Resuelve el alias a una versión concreta y carga esa versión, de forma que
+    modelo y versión reportada siempre coinciden. Devuelve (model, version).
+    Con `pooled=False` nunca se arranca un pool de procesos (modelos de la
+    caché multi-modelo, que se sirven en threads).
+    """
+    start = time.time()
+    client = MlflowClient()
+    with _phase(tracker, "resolve_alias"):
+        model_version = client.get_model_version_by_alias(name, alias)
+    registry_cache.set(name, alias, model_version)
+    logger.info(
+        f" Cargando {name} v{model_version.version} "
+        f"(alias '{alias}', modo {MODEL_LOAD_MODE})"
+    )
+
+    snapshot_key = f"{name}-{INFERENCE_ENGINE}-v{model_version.version}"
+    load = lambda: load_model_version(model_version, tracker)
+    if pooled and INFERENCE_BACKEND == "process":
+        # Los workers cargan el snapshot mmap; el pool anterior se apaga al drenarse
+        snapshot_path = mmap_models.ensure_snapshot(snapshot_key, load, MODEL_MMAP_DIR)
+        with _phase(tracker, "worker_pool"):
+            loaded = PooledModel(snapshot_path, INFERENCE_WORKERS)
+    elif MODEL_LOAD_MODE == "mmap":
+        loaded = mmap_models.load_shared(snapshot_key, load, MODEL_MMAP_DIR)
+    else:
+        loaded = load()
+    MODEL_LOADS.labels(name).inc()
+    MODEL_LOAD_SECONDS.labels(name).set(time.time() - start)
+    return loaded, model_version.version
+
+
+def fetch_production_model():
+    return fetch_model(MODEL_NAME, MODEL_ALIAS)
+
+
+model_cache = ModelCache(
+    lambda name, alias: fetch_model(name, alias, pooled=False),
+    max_bytes=int(MODEL_CACHE_MAX_GB * 1e9),
+    pinned=MODEL_CACHE_PINNED,
+)
+
+
+def get_holder(name, alias):
+    """
+    Holder del modelo pedido. El modelo principal usa el holder global (con
+    su batcher); el resto sale de la caché LRU, cargándose si hace falta.
+    """
+    if (name, alias) == (MODEL_NAME, MODEL_ALIAS):
+        return holder
+    return model_cache.get(name, alias)
+
+
+def _check_alias(name, alias, target):
+    """
+    Si el alias se ha movido (según la caché del registro) recarga en segundo
+    plano; la caché de modelos actualiza de paso el tamaño estimado.
+    """
+    model_version = registry_cache.get(name, alias)
+    if model_version is not None and target.version is not None and model_version.version != target.version:
+        model_cache.reload(name, alias)
+
+
+def check_mlflow():
+    """Diagnóstico: el servidor de MLflow responde a /health"""
+    mlflow_url = os.getenv("MLFLOW_TRACKING_URI")
+    health_resp = requests.get(f"{mlflow_url}/health", timeout=5)
+    logger.info(f" MLflow Server Health: {health_resp.status_code}")
+
+
+def check_minio():
+    """Diagnóstico: MinIO accesible y contenido del bucket 'mlflow'"""
+    s3_client = make_s3_client()
+    buckets = s3_client.list_buckets()
+    logger.info(f" MinIO accesible. Buckets: {[b['Name'] for b in buckets['Buckets']]}")
+
+    # Listar objetos en el bucket mlflow
+    try:
+        objects = s3_client.list_objects_v2(Bucket='mlflow', MaxKeys=5)
+        if 'Contents' in objects:
+            logger.info(f" Archivos en bucket 'mlflow': {len(objects['Contents'])} objetos")
+            for obj in objects.get('Contents', [])[:3]:
+                logger.info(f"   - {obj['Key']}")
+        else:
+            logger.warning("  Bucket 'mlflow' está vacío")
+    except Exception as list_err:
+        logger.error(f" Error listando bucket: {list_err}")
+
+
+def log_load_diagnostics():
+    """Metadata del modelo en el registro, para depurar un fallo de carga"""
+    try:
+        client = MlflowClient()
+
+        # Intentar obtener metadata del modelo
+        model_version = client.get_model_version_by_alias(MODEL_NAME, MODEL_ALIAS)
+        logger.info(f" Versión del modelo: {model_version.version}")
+        logger.info(f" Run ID: {model_version.run_id}")
+        logger.info(f" Source: {model_version.source}")
+
+        # Obtener URI del artefacto
+        run = client.get_run(model_version.run_id)
+        artifact_uri = run.info.artifact_uri
+        logger.info(f" Artifact URI: {artifact_uri}")
+
+    except Exception as diag_err:
+        logger.error(f" Error en diagnóstico: {diag_err}")
+
+
+def run_diagnostic(name, check):
+    """Ejecuta un diagnóstico cronometrado; un fallo se registra pero no aborta el arranque"""
+    try:
+        with startup.phase(name):
+            check()
     except Exception as e:
-        logger.error(f" MinIO no accesible: {e}")
-        return
-    
-    #  Test 3: Cargar el modelo
+        logger.error(f" Diagnóstico '{name}' fallido: {e}")
+
+
+def warm_up_start():
+    """
+    Arranque en segundo plano: los diagnósticos de conectividad corren en
+    paralelo con la carga del modelo y ninguno bloquea a uvicorn. `/ready`
+    responde 503 con el progreso hasta que el modelo está publicado.
+    """
+    diagnostics = [
+        threading.Thread(target=run_diagnostic, args=(name, check), name=f"diag-{name}", daemon=True)
+        for name, check in (("mlflow_health", check_mlflow), ("minio", check_minio))
+    ]
+    for thread in diagnostics:
+        thread.start()
+
     try:
         logger.info(f" Intentando cargar modelo: {MODEL_URI}")
-        
-        # Forzar configuración de S3 para MLflow
-        os.environ['MLFLOW_S3_IGNORE_TLS'] = 'true'
-        
-        model = mlflow.sklearn.load_model(MODEL_URI)
+        loaded, version = fetch_model(MODEL_NAME, MODEL_ALIAS, tracker=startup)
+        with startup.phase("swap"):
+            holder.swap(loaded, version)
         logger.info(" ------------------- ¡Modelo cargado exitosamente!")
-        client = MlflowClient()
-        model_version = client.get_model_version_by_alias(MODEL_NAME, "production")
-        logger.info(f" Versión del modelo: {model_version.version}")
-        
+        logger.info(f" Versión del modelo: {version}")
+        startup.finish()
     except Exception as e:
         logger.error(f" ERROR al cargar modelo: {str(e)}", exc_info=True)
-        
-        #  Diagnóstico adicional
+        for thread in diagnostics:
+            thread.join()
+        log_load_diagnostics()
+        startup.finish(e)
+        return
+
+    # Modelos fijados: se precargan en la caché para que no esperen a la primera petición
+    for pinned in MODEL_CACHE_PINNED:
+        name, _, alias = pinned.partition("@")
+        if (name, alias) == (MODEL_NAME, MODEL_ALIAS):
+            continue
         try:
-            
-            client = MlflowClient()
-            
-            # Intentar obtener metadata del modelo
-            model_version = client.get_model_version_by_alias(MODEL_NAME, "production")
-            logger.info(f" Versión del modelo: {model_version.version}")
-            logger.info(f" Run ID: {model_version.run_id}")
-            logger.info(f" Source: {model_version.source}")
-            
-            # Obtener URI del artefacto
-            run = client.get_run(model_version.run_id)
-            artifact_uri = run.info.artifact_uri
-            logger.info(f" Artifact URI: {artifact_uri}")
-            
-        except Exception as diag_err:
-            logger.error(f" Error en diagnóstico: {diag_err}")
-        
-        model = None
+            model_cache.get(name, alias)
+        except Exception as e:
+            logger.error(f" No se pudo precargar {pinned}: {e}")
+
+
+@app.on_event("startup")
+async def load_model():
+    # ✅ Verificar variables de entorno
+    logger.info("=" * 60)
+    logger.info("🔧 Configuración de Entorno:")
+    logger.info(f"  MLFLOW_TRACKING_URI: {os.getenv('MLFLOW_TRACKING_URI')}")
+    logger.info(f"  MLFLOW_S3_ENDPOINT_URL: {os.getenv('MLFLOW_S3_ENDPOINT_URL')}")
+    logger.info(f"  AWS_ACCESS_KEY_ID: {os.getenv('AWS_ACCESS_KEY_ID')}")
+    logger.info(f"  AWS_DEFAULT_REGION: {os.getenv('AWS_DEFAULT_REGION')}")
+    logger.info("=" * 60)
+
+    # Forzar configuración de S3 para MLflow
+    os.environ['MLFLOW_S3_IGNORE_TLS'] = 'true'
+
+    # El hook retorna enseguida: uvicorn acepta tráfico (/live, /ready con progreso)
+    startup.status = "loading"
+    threading.Thread(target=warm_up_start, name="startup", daemon=True).start()
 
 @app.get("/")
 def health_check():
-    client = MlflowClient()
-    model_version = client.get_model_version_by_alias(MODEL_NAME, "production")
+    # Respuesta desde memoria: el registro se consulta en segundo plano (TTL)
+    model_version = registry_cache.get(MODEL_NAME, MODEL_ALIAS)
+    registry_version = model_version.version if model_version is not None else holder.version
     return {
         "status": "running",
-        "model_loaded": model is not None,
+        "model_loaded": holder.model is not None,
         "model_uri": MODEL_URI,
+        "serving_version": holder.version,
         "mlflow_uri": os.getenv("MLFLOW_TRACKING_URI"),
         "s3_endpoint": os.getenv("MLFLOW_S3_ENDPOINT_URL"),
-        "model version" : f"Version del modelo: {model_version.version}"
+        "model version" : f"Version del modelo: {registry_version}"
     }
 
+@app.get("/live")
+def liveness():
+    """El proceso responde; no toca red"""
+    return {"status": "alive"}
+
+@app.get("/ready")
+def readiness():
+    """
+    Listo para tráfico cuando hay un modelo cargado; no toca red. Mientras
+    tanto responde 503 con el progreso del arranque (fases y tiempos).
+    """
+    if holder.model is None:
+        raise HTTPException(status_code=503, detail={"message": "Modelo no cargado", **startup.snapshot()})
+    if drain.draining:
+        raise HTTPException(
+            status_code=503,
+            detail={"message": "Réplica drenando", "serving_version": holder.version, **drain.snapshot()},
+        )
+    return {"status": "ready", "serving_version": holder.version, "startup": startup.snapshot()}
+
 @app.get("/predict")
 def predict():
-    if model is None:
+    if holder.model is None:
         raise HTTPException(status_code=503, detail="Modelo no disponible")
     
     try:
         dummy_input = [[1, 2]]
-        prediction = model.predict(dummy_input)
+        with holder.acquire() as current:
+            prediction = current.predict(dummy_input)
         
         return {
             "input": dummy_input,
@@ -149,6 +586,249 @@ def predict():
         logger.error(f"Error en predicción: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def parse_instances(instances, model):
+    """Valida `instances` contra el modelo y lo convierte a matriz (422 si no encaja)"""
+    if not instances:
+        raise HTTPException(status_code=422, detail="'instances' no puede estar vacío")
+
+    try:
+        X = np.asarray(instances, dtype=np.float64)
+    except ValueError:
+        X = None
+    if X is None or X.ndim != 2:
+        raise HTTPException(status_code=422, detail="Todas las filas deben tener la misma longitud")
+    n_features = getattr(model, "n_features_in_", None)
+    if n_features is not None and X.shape[1] != n_features:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Se esperaban {n_features} features por fila, recibidas {X.shape[1]}"
+        )
+    return X
+
+@app.post("/predict")
+@track_predict("/predict")
+async def predict_batch(request: PredictRequest):
+    current = holder.model
+    if current is None:
+        raise HTTPException(status_code=503, detail="Modelo no disponible")
+    X = parse_instances(request.instances, current)
+
+    try:
+        predictions, _ = await cached_predict(X)
+        return {
+            "predictions": predictions,
+            "model": MODEL_NAME
+        }
+    except BatcherSaturated as e:
+        logger.warning(f"Cola de inferencia saturada: {e}")
+        raise HTTPException(status_code=429, detail="Servidor saturado, reintentar más tarde")
+    except Exception as e:
+        logger.error(f"Error en predicción por lotes: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+class DuplexStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse que no escucha `http.disconnect` en paralelo: el
+    generador sigue leyendo el cuerpo de la petición mientras se responde y
+    esa escucha le robaría los mensajes del body.
+    """
+
+    async def __call__(self, scope, receive, send):
+        await self.stream_response(send)
+        if self.background is not None:
+            await self.background()
+
+@app.post("/predict/stream")
+async def predict_stream(request: Request):
+    """
+    Scoring masivo NDJSON: lee el cuerpo de forma incremental, puntúa en
+    chunks de STREAM_CHUNK_SIZE filas y devuelve las predicciones como NDJSON
+    chunked. La memoria no depende del tamaño de la entrada.
+
+    Los chunks pasan por el mismo batcher que POST /predict (cola acotada y
+    límite de lotes concurrentes): con la cola llena se responde 429 antes de
+    empezar y, si se satura a mitad, el error va como última línea.
+    """
+    if holder.model is None:
+        raise HTTPException(status_code=503, detail="Modelo no disponible")
+    if batcher.saturated:
+        logger.warning("Cola de inferencia saturada: se rechaza /predict/stream")
+        raise HTTPException(status_code=429, detail="Servidor saturado, reintentar más tarde")
+
+    async def apredict(X):
+        predictions, _ = await batcher.submit(X)
+        return predictions
+
+    lines = streaming.aiter_lines(request.stream(), max_line_bytes=STREAM_MAX_LINE_BYTES)
+    return DuplexStreamingResponse(
+        streaming.ascore_lines(lines, apredict, chunk_size=STREAM_CHUNK_SIZE),
+        media_type="application/x-ndjson",
+    )
+
+@app.post("/admin/reload", status_code=202)
+def reload_model():
+    """
+    Carga en segundo plano la versión actual del alias y hace swap atómico.
+    El modelo anterior sigue sirviendo hasta que termine la carga.
+    """
+    registry_cache.invalidate(MODEL_NAME)
+    started = holder.reload_async(fetch_production_model)
+    return {"started": started, **holder.reload_state, "serving_version": holder.version}
+
+@app.get("/admin/reload")
+def reload_status():
+    return {**holder.reload_state, "serving_version": holder.version}
+
+@app.post("/admin/drain")
+def start_drain(wait: float = 0):
+    """
+    Saca la réplica del balanceo: 503 en /ready y en las rutas de predicción
+    nuevas. Espera hasta `wait` segundos a que terminen las que están en curso.
+    """
+    drain.start()
+    logger.info(" Réplica drenando: no se aceptan peticiones nuevas")
+    idle = drain.wait_idle(wait)
+    return {**drain.snapshot(), "idle": idle, "serving_version": holder.version}
+
+@app.delete("/admin/drain")
+def stop_drain():
+    """Vuelve a aceptar tráfico"""
+    drain.stop()
+    logger.info(" Réplica de vuelta en el balanceo")
+    return {**drain.snapshot(), "serving_version": holder.version}
+
+@app.get("/admin/drain")
+def drain_status():
+    return {**drain.snapshot(), "model_loaded": holder.model is not None, "serving_version": holder.version}
+
+class WarmupRequest(BaseModel):
+    instances: Optional[List[List[float]]] = None
+    rows: int = WARMUP_ROWS
+    batches: int = 0  # 0 = uno por worker de inferencia
+
+@app.post("/admin/warmup")
+async def warm_up(request: Optional[WarmupRequest] = None):
+    """
+    Lanza lotes de predicción por el mismo camino que POST /predict (batcher y
+    pool de procesos, sin caché de resultados) para que el primer acceso al
+    modelo no lo pague el tráfico real. Sin `instances`, filas sintéticas.
+    """
+    request = request or WarmupRequest()
+    current = holder.model
+    if current is None:
+        raise HTTPException(status_code=503, detail="Modelo no disponible")
+    if request.instances:
+        X = parse_instances(request.instances, current)
+    else:
+        n_features = getattr(current, "n_features_in_", None)
+        if n_features is None:
+            raise HTTPException(status_code=422, detail="El modelo no expone n_features_in_: enviar 'instances'")
+        X = np.random.default_rng().random((max(1, request.rows), n_features))
+
+    batches = request.batches or (INFERENCE_WORKERS if INFERENCE_BACKEND == "process" else 1)
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(batcher.submit(X) for _ in range(batches)))
+    except Exception as e:
+        logger.error(f"Error en el calentamiento: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    elapsed = round(time.perf_counter() - start, 3)
+    logger.info(f" Calentamiento: {batches} lotes de {len(X)} filas en {elapsed}s")
+    return {"rows": len(X), "batches": batches, "seconds": elapsed, "serving_version": holder.version}
+
+@app.get("/admin/profile")
+def profile_report(top: int = 30, sort: str = "self", format: str = "json"):
+    """
+    Puntos calientes agregados de las peticiones muestreadas: muestras propias
+    y totales por función. `sort=total` ordena por tiempo inclusivo y
+    `format=folded` devuelve las pilas plegadas (flamegraph.pl, speedscope).
+    """
+    if format == "folded":
+        return Response(profiler.folded(), media_type="text/plain")
+    return profiler.report(top=top, sort=sort)
+
+@app.post("/admin/profile")
+def start_profile(rate: float = 0.01, duration: float = 300, reset: bool = True):
+    """
+    Muestrea una fracción `rate` de las peticiones de predicción durante
+    `duration` segundos (0 = hasta DELETE). Con `reset` se descarta lo acumulado.
+    """
+    if reset:
+        profiler.reset()
+    profiler.configure(rate, duration or None)
+    logger.info(f" Perfilado activado: {rate:.2%} de las peticiones durante {duration or '∞'}s")
+    return profiler.report(top=0)
+
+@app.delete("/admin/profile")
+def stop_profile():
+    """Deja de muestrear; lo acumulado sigue disponible en GET /admin/profile"""
+    profiler.configure(0.0)
+    return profiler.report(top=0)
+
+@app.post("/models/{name}/{alias}/predict")
+@track_predict("/models/predict")
+async def predict_model(name: str, alias: str, request: PredictRequest):
+    """
+    Predicción con cualquier modelo registrado. Los modelos se cargan bajo
+    demanda en la caché LRU (acotada por MODEL_CACHE_MAX_GB); la primera
+    petición a un modelo espera a su carga.
+    """
+    loop = asyncio.get_running_loop()
+    try:
+        target = await loop.run_in_executor(None, get_holder, name, alias)
+    except Exception as e:
+        logger.error(f"Error cargando modelo {name}@{alias}: {e}")
+        raise HTTPException(status_code=404, detail=f"Modelo {name}@{alias} no disponible: {e}")
+    if target is holder:
+        if holder.model is None:
+            raise HTTPException(status_code=503, detail="Modelo no disponible")
+        X = parse_instances(request.instances, holder.model)
+        try:
+            predictions, version = await cached_predict(X)
+        except BatcherSaturated:
+            raise HTTPException(status_code=429, detail="Servidor saturado, reintentar más tarde")
+        return {"predictions": predictions, "model": name, "version": version}
+
+    _check_alias(name, alias, target)
+
+    def run(X):
+        return target.predict(X)
+
+    try:
+        X = parse_instances(request.instances, target.model)
+        predictions, version = await loop.run_in_executor(None, run, X)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error en predicción con {name}@{alias}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"predictions": predictions.tolist(), "model": name, "version": version}
+
+@app.post("/models/{name}/{alias}/reload", status_code=202)
+def reload_cached_model(name: str, alias: str):
+    """Descarta el modelo de la caché; la próxima petición carga la versión actual del alias"""
+    if (name, alias) == (MODEL_NAME, MODEL_ALIAS):
+        return reload_model()
+    registry_cache.invalidate(name)
+    return {"invalidated": model_cache.invalidate(name, alias)}
+
+@app.get("/admin/models")
+def model_cache_stats():
+    """Modelos en la caché multi-modelo, su tamaño estimado y su versión"""
+    return model_cache.stats()
+
+@app.get("/admin/cache/stats")
+def cache_stats():
+    """Contadores de la caché de resultados (hits, misses, evictions...)"""
+    if result_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **result_cache.stats()}
+
+@app.get("/metrics")
+def metrics_endpoint():
+    """Métricas en formato de texto de Prometheus"""
+    return Response(REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.get("/debug/s3-test")
 def test_s3_connection():
     """Endpoint de debug para probar conectividad S3"""
@@ -0,0 +1,213 @@
+"""
+Métricas en formato de texto de Prometheus, sin dependencias.
+
+Los contadores e histogramas son por thread: cada thread escribe en su
+propia celda (una lista creada la primera vez que ese thread observa) y solo
+`render()` suma las celdas de todos los threads. En el hot path no hay locks
+ni contención: un `observe()` es un `bisect` y dos sumas sobre una lista local.
+Por eso la API no usa prometheus_client (un lock por `inc`/`observe`); el
+watcher, fuera de cualquier camino caliente, sí lo usa.
+"""
+
+import bisect
+import math
+import threading
+from typing import Callable, Dict, List, Sequence, Tuple
+
+# Buckets por defecto para latencias (segundos)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class _PerThread:
+    """Celdas por thread de tamaño fijo; `values()` las suma."""
+
+    def __init__(self, size: int):
+        self._size = size
+        self._local = threading.local()
+        self._cells: List[list] = []
+        self._lock = threading.Lock()
+
+    def cell(self) -> list:
+        try:
+            return self._local.cell
+        except AttributeError:
+            cell = [0] * self._size
+            with self._lock:
+                self._cells.append(cell)
+            self._local.cell = cell
+            return cell
+
+    def values(self) -> list:
+        with self._lock:
+            cells = list(self._cells)
+        return [sum(c[i] for c in cells) for i in range(self._size)]
+
+
+class Counter:
+    def __init__(self):
+        self._data = _PerThread(1)
+
+    def inc(self, amount=1):
+        self._data.cell()[0] += amount
+
+    def value(self):
+        return self._data.values()[0]
+
+    def _samples(self, name, labels):
+        return [(name, labels, self.value())]
+
+
+class Gauge:
+    """
+    `inc()`/`dec()` van por celdas por thread (se pueden llamar desde threads
+    distintos); `set()` fija una base común, para valores como la duración de
+    la última carga.
+    """
+
+    def __init__(self):
+        self._data = _PerThread(1)
+        self._base = 0.0
+
+    def inc(self, amount=1):
+        self._data.cell()[0] += amount
+
+    def dec(self, amount=1):
+        self._data.cell()[0] -= amount
+
+    def set(self, value):
+        with self._data._lock:
+            for c in self._data._cells:
+                c[0] = 0
+            self._base = value
+
+    def value(self):
+        return self._base + self._data.values()[0]
+
+    def _samples(self, name, labels):
+        return [(name, labels, self.value())]
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        # [contadores por bucket..., +Inf, suma]
+        self._data = _PerThread(len(self.buckets) + 2)
+
+    def observe(self, value):
+        cell = self._data.cell()
+        cell[bisect.bisect_left(self.buckets, value)] += 1
+        cell[-1] += value
+
+    def _samples(self, name, labels):
+        values = self._data.values()
+        samples, cumulative = [], 0
+        for bound, count in zip(self.buckets + (math.inf,), values):
+            cumulative += count
+            le = "+Inf" if bound == math.inf else repr(bound)
+            samples.append((f"{name}_bucket", labels + (("le", le),), cumulative))
+        samples.append((f"{name}_count", labels, cumulative))
+        samples.append((f"{name}_sum", labels, values[-1]))
+        return samples
+
+
+class _Family:
+    """Métrica con etiquetas: un hijo por combinación de valores."""
+
+    def __init__(self, kind: str, name: str, doc: str, labelnames: Tuple[str, ...], factory: Callable):
+        self.kind = kind
+        self.name = name
+        self.doc = doc
+        self.labelnames = labelnames
+        self._factory = factory
+        self._children: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+        if not labelnames:
+            self._children[()] = factory()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name}: se esperaban etiquetas {self.labelnames}")
+            with self._lock:
+                child = self._children.setdefault(values, self._factory())
+        return child
+
+    def __getattr__(self, attr):
+        # Métrica sin etiquetas: inc/dec/set/observe directamente
+        if attr.startswith("_") or self.labelnames:
+            raise AttributeError(attr)
+        return getattr(self._children[()], attr)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in list(self._children.items()):
+            labels = tuple(zip(self.labelnames, values))
+            for sample, sample_labels, value in child._samples(self.name, labels):
+                lines.append(f"{sample}{_format_labels(sample_labels)} {_format_value(value)}")
+        return lines
+
+
+class _Callback:
+    """Gauge cuyo valor se calcula al exportar (p.ej. tamaño de una caché)."""
+
+    def __init__(self, name: str, doc: str, fn: Callable[[], float]):
+        self.name = name
+        self.doc = doc
+        self.fn = fn
+
+    def render(self) -> List[str]:
+        try:
+            value = self.fn()
+        except Exception:
+            return []
+        if value is None:
+            return []
+        return [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} gauge", f"{self.name} {_format_value(value)}"]
+
+
+def _format_labels(labels) -> str:
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in labels)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + "}"
+
+
+def _format_value(value) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return repr(int(value)) if abs(value) < 1e15 else repr(value)
+    return repr(value)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, doc, labelnames=()):
+        return self._add(_Family("counter", name, doc, tuple(labelnames), Counter))
+
+    def gauge(self, name, doc, labelnames=()):
+        return self._add(_Family("gauge", name, doc, tuple(labelnames), Gauge))
+
+    def histogram(self, name, doc, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._add(_Family("histogram", name, doc, tuple(labelnames), lambda: Histogram(buckets)))
+
+    def gauge_fn(self, name, doc, fn):
+        return self._add(_Callback(name, doc, fn))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
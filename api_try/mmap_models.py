@@ -0,0 +1,95 @@
+import fcntl
+import glob
+import logging
+import os
+import time
+from typing import Any, Callable
+
+import joblib
+
+logger = logging.getLogger(__name__)
+
+
+def _snapshot_path(mmap_dir: str, key: str) -> str:
+    return os.path.join(mmap_dir, f"{key}.joblib")
+
+
+def ensure_snapshot(key: str, loader: Callable[[], Any], mmap_dir: str, keep: int = 2) -> str:
+    """
+    Devuelve la ruta del snapshot joblib de `key`, creándolo con `loader()`
+    si no existe. Solo un proceso lo genera (lock con flock); el resto espera
+    y reutiliza el fichero.
+    """
+    os.makedirs(mmap_dir, exist_ok=True)
+    path = _snapshot_path(mmap_dir, key)
+    if os.path.exists(path):
+        return path
+
+    with open(path + ".lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            if not os.path.exists(path):
+                start = time.time()
+                model = loader()
+                tmp_path = f"{path}.tmp.{os.getpid()}"
+                joblib.dump(model, tmp_path)
+                os.replace(tmp_path, path)
+                del model
+                logger.info(
+                    f" Snapshot mmap creado: {path} "
+                    f"({os.path.getsize(path) / 1e6:.1f} MB, {time.time() - start:.2f}s)"
+                )
+                _prune(mmap_dir, key, keep)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+    return path
+
+
+def load_snapshot(path: str) -> Any:
+    model = joblib.load(path, mmap_mode="r")
+    logger.info(f" Modelo mapeado en memoria desde {path} (pid {os.getpid()})")
+    return model
+
+
+def load_shared(key: str, loader: Callable[[], Any], mmap_dir: str, keep: int = 2) -> Any:
+    """
+    Carga el modelo `key` con sus arrays NumPy mapeados en memoria (solo lectura).
+
+    El primer proceso que lo necesita llama a `loader()` y vuelca el modelo
+    con joblib (cada array grande queda como bloque contiguo en el fichero).
+    El resto de workers, y los reinicios posteriores, lo abren con
+    `mmap_mode='r'`, de modo que todos comparten las mismas páginas del page
+    cache en lugar de tener cada uno su copia deserializada.
+
+    Ojo: los estimadores que copian sus buffers al deserializar (p.ej. el
+    `Tree` de sklearn) tendrán igualmente una copia privada; solo se
+    comparten los atributos que son arrays NumPy.
+    """
+    return load_snapshot(ensure_snapshot(key, loader, mmap_dir, keep))
+
+
+def _prune(mmap_dir: str, key: str, keep: int):
+    """
+    Borra snapshots antiguos del mismo modelo (y su `.lock`), conservando los
+    `keep` más recientes. Es seguro aunque otro proceso los tenga mapeados: el
+    kernel mantiene las páginas hasta que se desmapean.
+    """
+    prefix = key.rsplit("-v", 1)[0]
+    snapshots = sorted(
+        glob.glob(os.path.join(mmap_dir, f"{prefix}-v*.joblib")),
+        key=os.path.getmtime,
+        reverse=True,
+    )
+    for old in snapshots[keep:]:
+        try:
+            os.remove(old)
+            logger.info(f" Snapshot mmap antiguo eliminado: {old}")
+        except OSError as e:
+            logger.warning(f" No se pudo eliminar {old}: {e}")
+            continue
+        try:
+            os.remove(old + ".lock")
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f" No se pudo eliminar {old}.lock: {e}")
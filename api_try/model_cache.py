@@ -0,0 +1,215 @@
+import logging
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Iterable, Optional, Tuple
+
+import numpy as np
+
+from model_store import ModelHolder
+
+logger = logging.getLogger(__name__)
+
+
+def estimate_model_bytes(model) -> int:
+    """
+    Tamaño en memoria del modelo recorriendo su grafo de objetos: `nbytes`
+    de cada array NumPy (incluidos los buffers de los `Tree` de sklearn, vía
+    `__getstate__`) más `sys.getsizeof` del resto. Cada objeto cuenta una vez.
+    """
+    # id -> objeto: mantiene vivos los temporales de `__getstate__` para que su id no se reutilice
+    seen = {}
+    stack = [model]
+    total = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or obj is None:
+            continue
+        seen[id(obj)] = obj
+
+        if isinstance(obj, np.ndarray):
+            # Las vistas cuentan a través de su array base (una sola vez)
+            if isinstance(obj.base, np.ndarray):
+                stack.append(obj.base)
+            else:
+                total += obj.nbytes
+            if obj.dtype == object:
+                stack.extend(obj.ravel())
+            continue
+
+        total += sys.getsizeof(obj, 0)
+        if isinstance(obj, (str, bytes, int, float, bool)):
+            continue
+        if isinstance(obj, dict):
+            stack.extend(obj.keys())
+            stack.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset)):
+            stack.extend(obj)
+        elif hasattr(obj, "__dict__"):
+            stack.append(vars(obj))
+        elif hasattr(obj, "__getstate__"):
+            # Objetos de extensión (p.ej. sklearn Tree) exponen sus arrays así
+            try:
+                stack.append(obj.__getstate__())
+            except Exception:
+                pass
+    return total
+
+
+class _Entry:
+    def __init__(self, holder: ModelHolder, size: int):
+        self.holder = holder
+        self.size = size
+
+
+class ModelCache:
+    """
+    Caché LRU de modelos cargados, acotada por memoria (`max_bytes`).
+
+    - Carga perezosa con `loader(name, alias) -> (model, version)`.
+    - Cargas concurrentes del mismo modelo se deduplican (un único Future).
+    - Los modelos en `pinned` ("name@alias") nunca se desalojan.
+    - Al desalojar, el modelo se retira de su ModelHolder: las peticiones en
+      curso terminan con él y después se libera.
+    - `reload()` recarga una entrada en segundo plano (alias movido) y
+      vuelve a estimar su tamaño antes de publicarla.
+    """
+
+    def __init__(self, loader: Callable[[str, str], Tuple[object, object]], max_bytes: int,
+                 pinned: Iterable[str] = ()):
+        self.loader = loader
+        self.max_bytes = max_bytes
+        self.pinned = set(pinned)
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.evictions = 0
+
+    def get(self, name: str, alias: str) -> ModelHolder:
+        """Holder del modelo, cargándolo si hace falta (bloqueante)."""
+        key = (name, alias)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                return entry.holder
+
+            future = self._loading.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._loading[key] = future
+
+        if not owner:
+            return future.result()
+
+        try:
+            holder = self._load(key)
+            future.set_result(holder)
+            return holder
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._loading.pop(key, None)
+
+    def _load(self, key) -> ModelHolder:
+        start = time.time()
+        model, version = self.loader(*key)
+        size = estimate_model_bytes(model)
+        holder = ModelHolder()
+        holder.swap(model, version)
+        self.loads += 1
+        logger.info(
+            f" Modelo {key[0]}@{key[1]} v{version} cargado en caché "
+            f"({size / 1e6:.1f} MB, {time.time() - start:.2f}s)"
+        )
+
+        with self._lock:
+            self._entries[key] = _Entry(holder, size)
+            evicted = self._evict(keep=key)
+        # Fuera del lock: liberar un modelo puede tardar (gc, cerrar recursos)
+        for entry in evicted:
+            entry.holder.retire()
+        return holder
+
+    def _evict(self, keep):
+        """Saca entradas LRU hasta cumplir el presupuesto; devuelve las desalojadas"""
+        evicted = []
+        total = sum(e.size for e in self._entries.values())
+        for key in list(self._entries):
+            if total <= self.max_bytes:
+                break
+            if key == keep or f"{key[0]}@{key[1]}" in self.pinned:
+                continue
+            entry = self._entries.pop(key)
+            total -= entry.size
+            self.evictions += 1
+            logger.info(f" Desalojando modelo {key[0]}@{key[1]} ({entry.size / 1e6:.1f} MB)")
+            evicted.append(entry)
+        if total > self.max_bytes:
+            logger.warning(
+                f" Caché de modelos por encima del presupuesto: {total / 1e6:.1f} MB "
+                f"> {self.max_bytes / 1e6:.1f} MB (solo quedan modelos fijados o el recién cargado)"
+            )
+        return evicted
+
+    def reload(self, name: str, alias: str) -> bool:
+        """Recarga en caliente la entrada con `loader`; False si no está o ya recarga."""
+        key = (name, alias)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return False
+
+        def load():
+            model, version = self.loader(name, alias)
+            self._resize(key, entry, estimate_model_bytes(model), version)
+            return model, version
+
+        return entry.holder.reload_async(load)
+
+    def _resize(self, key, entry: _Entry, size: int, version):
+        with self._lock:
+            if self._entries.get(key) is not entry:
+                return  # desalojada o invalidada durante la carga
+            logger.info(
+                f" Modelo {key[0]}@{key[1]} v{version} recargado en caché "
+                f"({entry.size / 1e6:.1f} MB -> {size / 1e6:.1f} MB)"
+            )
+            entry.size = size
+            evicted = self._evict(keep=key)
+        for evicted_entry in evicted:
+            evicted_entry.holder.retire()
+
+    def invalidate(self, name: str, alias: Optional[str] = None):
+        """Descarta las entradas del modelo; la próxima petición lo recarga."""
+        with self._lock:
+            keys = [k for k in self._entries if k[0] == name and (alias is None or k[1] == alias)]
+            entries = [self._entries.pop(k) for k in keys]
+        for entry in entries:
+            entry.holder.retire()
+        return len(entries)
+
+    def stats(self):
+        with self._lock:
+            models = [
+                {
+                    "model": f"{k[0]}@{k[1]}",
+                    "version": e.holder.version,
+                    "bytes": e.size,
+                    "pinned": f"{k[0]}@{k[1]}" in self.pinned,
+                }
+                for k, e in self._entries.items()
+            ]
+        return {
+            "max_bytes": self.max_bytes,
+            "used_bytes": sum(m["bytes"] for m in models),
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "models": models,
+        }
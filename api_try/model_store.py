@@ -0,0 +1,154 @@
+import gc
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def _close_model(model):
+    """Libera recursos externos del modelo (p.ej. un pool de procesos)"""
+    close = getattr(model, "close", None)
+    if callable(close):
+        close()
+
+
+class _Slot:
+    """Modelo cargado + contador de peticiones que lo están usando."""
+
+    def __init__(self, model, version):
+        self.model = model
+        self.version = version
+        self.refs = 0
+        self.retired = False
+
+
+class ModelHolder:
+    """
+    Contenedor del modelo en servicio con swap atómico.
+
+    Cada predicción toma una referencia con `acquire()`. Al hacer `swap()` el
+    slot anterior queda retirado y su memoria se libera cuando termina la
+    última petición que lo estaba usando.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._slot: Optional[_Slot] = None
+        self._reload_thread: Optional[threading.Thread] = None
+        self.reload_state = {"status": "idle", "version": None, "error": None, "elapsed_s": None}
+
+    @property
+    def model(self):
+        slot = self._slot
+        return slot.model if slot else None
+
+    @property
+    def version(self):
+        slot = self._slot
+        return slot.version if slot else None
+
+    @contextmanager
+    def acquire(self):
+        """Devuelve el modelo actual y lo mantiene vivo mientras dure el bloque."""
+        with self._lock:
+            slot = self._slot
+            if slot is None:
+                raise RuntimeError("Modelo no disponible")
+            slot.refs += 1
+        try:
+            yield slot.model
+        finally:
+            self._release(slot)
+
+    def predict(self, X) -> Tuple[Any, Any]:
+        """Predice con el modelo actual; devuelve `(predicciones, versión)` del mismo slot."""
+        with self._lock:
+            slot = self._slot
+            if slot is None:
+                raise RuntimeError("Modelo no disponible")
+            slot.refs += 1
+        try:
+            return slot.model.predict(X), slot.version
+        finally:
+            self._release(slot)
+
+    def _release(self, slot: _Slot):
+        with self._lock:
+            slot.refs -= 1
+            drained = slot.retired and slot.refs == 0
+        if drained:
+            self._free(slot)
+
+    def _free(self, slot: _Slot):
+        logger.info(f" Liberando modelo retirado (versión {slot.version})")
+        _close_model(slot.model)
+        slot.model = None
+        gc.collect()
+
+    def swap(self, model, version):
+        """Publica el nuevo modelo de forma atómica y retira el anterior."""
+        new_slot = _Slot(model, version)
+        with self._lock:
+            old_slot, self._slot = self._slot, new_slot
+            if old_slot is None:
+                return
+            old_slot.retired = True
+            drained = old_slot.refs == 0
+        logger.info(f" Swap de modelo: versión {old_slot.version} -> {version}")
+        if drained:
+            self._free(old_slot)
+
+    def retire(self):
+        """Deja el holder sin modelo; se libera cuando se drenen sus peticiones."""
+        with self._lock:
+            old_slot, self._slot = self._slot, None
+            if old_slot is None:
+                return
+            old_slot.retired = True
+            drained = old_slot.refs == 0
+        if drained:
+            self._free(old_slot)
+
+    def reload_async(self, loader: Callable[[], Tuple[Any, Any]]) -> bool:
+        """
+        Carga un modelo nuevo en un thread de fondo con `loader()` (que
+        devuelve `(model, version)`) y hace swap al terminar. El modelo
+        anterior sigue sirviendo mientras tanto. Devuelve False si ya hay
+        una recarga en curso.
+        """
+        with self._lock:
+            if self._reload_thread is not None and self._reload_thread.is_alive():
+                return False
+            self.reload_state = {"status": "loading", "version": None, "error": None, "elapsed_s": None}
+            self._reload_thread = threading.Thread(
+                target=self._reload, args=(loader,), name="model-reload", daemon=True
+            )
+            self._reload_thread.start()
+        return True
+
+    def _reload(self, loader):
+        start = time.time()
+        try:
+            model, version = loader()
+            if version is not None and version == self.version:
+                logger.info(f" Versión {version} ya en servicio, se descarta la recarga")
+                _close_model(model)
+            else:
+                self.swap(model, version)
+            self.reload_state = {
+                "status": "done",
+                "version": version,
+                "error": None,
+                "elapsed_s": round(time.time() - start, 2),
+            }
+        except Exception as e:
+            logger.error(f" ERROR en recarga de modelo: {e}", exc_info=True)
+            self.reload_state = {
+                "status": "failed",
+                "version": None,
+                "error": str(e),
+                "elapsed_s": round(time.time() - start, 2),
+            }
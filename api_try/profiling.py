@@ -0,0 +1,200 @@
+"""
+Perfilado muestreado de peticiones (opt-in, sin redeploy).
+
+Una fracción `rate` de las peticiones de predicción activa un muestreador de
+pilas: mientras haya alguna en curso, un thread toma `sys._current_frames()`
+cada `interval` segundos y acumula por función las muestras propias (la
+función está en lo alto de la pila) y totales (está en algún punto de la
+pila), además de las pilas plegadas para generar un flamegraph. Sin
+peticiones muestreadas el thread está parado y no cuesta nada.
+
+Se muestrean todos los threads del proceso (event loop, batcher, thread
+pool), así que las muestras de peticiones concurrentes no muestreadas
+también cuentan: es un perfil del proceso mientras atiende tráfico, no de
+una petición aislada. Los workers del pool de procesos no se ven (solo la
+espera en el proceso principal).
+
+cProfile no encaja aquí: solo instrumenta el thread en el que se activa (la
+predicción corre en el thread pool del batcher) y dos perfiles simultáneos
+se pisan.
+"""
+
+import functools
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Callable, Optional
+
+# Frames en lo alto de la pila de un thread ocioso (esperando trabajo o E/S)
+IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+    ("socketserver.py", "serve_forever"),
+}
+OTHER_STACKS = "[otras pilas]"
+
+
+@functools.lru_cache(maxsize=4096)
+def _short_path(filename: str) -> str:
+    """Ruta relativa a la entrada de sys.path más larga que la contenga"""
+    for base in sorted((p for p in sys.path if p), key=len, reverse=True):
+        base = os.path.join(os.path.abspath(base), "")
+        if filename.startswith(base):
+            return filename[len(base):]
+    return filename
+
+
+def _label(fn) -> str:
+    filename, lineno, name = fn
+    return f"{name} ({_short_path(filename)}:{lineno})"
+
+
+class StackProfiler:
+    def __init__(self, rate: float = 0.0, interval: float = 0.005, max_stacks: int = 5000):
+        self.rate = rate
+        self.interval = interval
+        self.max_stacks = max_stacks
+        self.until: Optional[float] = None  # fin de una activación temporal
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._active = 0
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._self = Counter()
+            self._total = Counter()
+            self._stacks = Counter()
+            self._samples = 0
+            self._requests = 0
+            self._since = time.time()
+
+    def configure(self, rate: float, duration: Optional[float] = None):
+        """Fija la fracción de peticiones muestreadas; con `duration`, vuelve a 0 al expirar"""
+        self.rate = min(1.0, max(0.0, rate))
+        self.until = time.time() + duration if duration else None
+
+    def should_sample(self, forced: bool = False) -> bool:
+        if forced:
+            return True
+        if self.until is not None and time.time() > self.until:
+            self.rate, self.until = 0.0, None
+        return self.rate > 0 and random.random() < self.rate
+
+    def begin(self):
+        with self._lock:
+            self._active += 1
+            self._requests += 1
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="stack-profiler", daemon=True)
+                self._thread.start()
+            self._wakeup.set()
+
+    def end(self):
+        with self._lock:
+            self._active -= 1
+            if self._active == 0:
+                self._wakeup.clear()
+
+    def _run(self):
+        me = threading.get_ident()
+        while True:
+            self._wakeup.wait()
+            self._sample(me)
+            time.sleep(self.interval)
+
+    def _sample(self, me):
+        frames = sys._current_frames()
+        stacks = []
+        for ident, frame in frames.items():
+            if ident == me:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+                frame = frame.f_back
+            top_filename, _, top_name = stack[0]
+            if (os.path.basename(top_filename), top_name) not in IDLE_FRAMES:
+                stacks.append(stack)
+        del frames
+
+        with self._lock:
+            for stack in stacks:
+                self._samples += 1
+                self._self[stack[0]] += 1
+                self._total.update(set(stack))
+                folded = ";".join(_label(fn) for fn in reversed(stack))
+                if folded in self._stacks or len(self._stacks) < self.max_stacks:
+                    self._stacks[folded] += 1
+                else:
+                    self._stacks[OTHER_STACKS] += 1
+
+    def report(self, top: int = 30, sort: str = "self") -> dict:
+        """Funciones con más muestras (propias o totales) y su porcentaje"""
+        with self._lock:
+            samples = self._samples
+            counts = self._total if sort == "total" else self._self
+            hottest = [fn for fn, _ in counts.most_common(top)]
+            hot_spots = [
+                {
+                    "function": _label(fn),
+                    "self": self._self[fn],
+                    "self_pct": round(100 * self._self[fn] / samples, 2),
+                    "total": self._total[fn],
+                    "total_pct": round(100 * self._total[fn] / samples, 2),
+                }
+                for fn in hottest
+            ]
+            return {
+                "rate": self.rate,
+                "expires_in_s": round(self.until - time.time(), 1) if self.until is not None else None,
+                "interval_ms": self.interval * 1000,
+                "since": self._since,
+                "requests_sampled": self._requests,
+                "active": self._active,
+                "samples": samples,
+                "sort": "total" if sort == "total" else "self",
+                "hot_spots": hot_spots,
+            }
+
+    def folded(self) -> str:
+        """Pilas plegadas ('a;b;c muestras' por línea) para flamegraph.pl o speedscope"""
+        with self._lock:
+            return "".join(f"{stack} {count}\n" for stack, count in self._stacks.most_common())
+
+
+class ProfileMiddleware:
+    """
+    Middleware ASGI: decide por petición si se muestrea (fracción del
+    profiler o cabecera `X-Profile: 1` si `allow_header`).
+    """
+
+    def __init__(self, app, profiler: StackProfiler, is_target: Callable[[str], bool], allow_header: bool = False):
+        self.app = app
+        self.profiler = profiler
+        self.is_target = is_target
+        self.allow_header = allow_header
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.is_target(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+
+        forced = self.allow_header and (b"x-profile", b"1") in scope.get("headers", ())
+        if not self.profiler.should_sample(forced):
+            await self.app(scope, receive, send)
+            return
+
+        self.profiler.begin()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.profiler.end()
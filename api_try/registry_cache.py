@@ -0,0 +1,58 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class RegistryCache:
+    """
+    Caché en memoria con TTL para metadatos del registro (alias -> versión).
+
+    `get()` nunca bloquea en red: si la entrada ha caducado devuelve el valor
+    anterior y lanza el refresco en un thread de fondo (stale-while-revalidate).
+    El path de swap puede forzar el valor con `set()` o descartarlo con
+    `invalidate()`.
+    """
+
+    def __init__(self, fetch_fn: Callable[[str, str], Any], ttl_s: float = 30.0):
+        self.fetch_fn = fetch_fn
+        self.ttl_s = ttl_s
+        self._entries: Dict[Tuple[str, str], Tuple[Any, float]] = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+
+    def get(self, name: str, alias: str) -> Optional[Any]:
+        key = (name, alias)
+        entry = self._entries.get(key)
+        if entry is None or time.monotonic() - entry[1] > self.ttl_s:
+            self._refresh_async(key)
+        return entry[0] if entry else None
+
+    def set(self, name: str, alias: str, value: Any):
+        self._entries[(name, alias)] = (value, time.monotonic())
+
+    def invalidate(self, name: Optional[str] = None):
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries if k[0] == name]:
+                    del self._entries[key]
+
+    def _refresh_async(self, key):
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+        threading.Thread(target=self._refresh, args=(key,), name="registry-refresh", daemon=True).start()
+
+    def _refresh(self, key):
+        try:
+            self.set(*key, self.fetch_fn(*key))
+        except Exception as e:
+            logger.warning(f" No se pudo refrescar metadata de {key[0]}@{key[1]}: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(key)
@@ -0,0 +1,100 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, List, Tuple
+
+import numpy as np
+
+# Overhead aproximado por entrada (nodo del OrderedDict + objetos Python)
+_ENTRY_OVERHEAD = 96
+
+
+class ResultCache:
+    """
+    Caché LRU de predicciones por fila, ligada a la versión del modelo.
+
+    La clave es un hash de los bytes de la fila. Toda la caché pertenece a
+    una única versión: cuando llega una consulta con otra versión (el alias
+    se movió) se vacía entera. Acotada por número de entradas y por bytes.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._data: "OrderedDict[bytes, Tuple[Any, int]]" = OrderedDict()
+        self._version = None
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.flushes = 0
+
+    @staticmethod
+    def _key(row: np.ndarray) -> bytes:
+        return hashlib.blake2b(row.tobytes(), digest_size=16).digest()
+
+    def _switch_version(self, version):
+        if version != self._version:
+            if self._data:
+                self.flushes += 1
+            self._data.clear()
+            self._bytes = 0
+            self._version = version
+
+    def lookup(self, X: np.ndarray, version) -> Tuple[List[Any], List[int]]:
+        """
+        Devuelve (resultados, índices_sin_caché). `resultados[i]` es None para
+        las filas que hay que enviar al modelo.
+        """
+        X = np.ascontiguousarray(X)
+        keys = [self._key(row) for row in X]
+        results: List[Any] = [None] * len(keys)
+        missing = []
+        with self._lock:
+            self._switch_version(version)
+            for i, key in enumerate(keys):
+                entry = self._data.get(key)
+                if entry is None:
+                    missing.append(i)
+                else:
+                    self._data.move_to_end(key)
+                    results[i] = entry[0]
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+        return results, missing
+
+    def store(self, X: np.ndarray, predictions, version):
+        X = np.ascontiguousarray(X)
+        keys = [self._key(row) for row in X]
+        with self._lock:
+            # Puntuado por otra versión que la de `lookup` (hubo un swap entre
+            # medias): no se cachea bajo la versión equivocada
+            if version != self._version:
+                return
+            for key, pred in zip(keys, predictions):
+                size = len(key) + getattr(pred, "nbytes", 8) + _ENTRY_OVERHEAD
+                old = self._data.pop(key, None)
+                if old is not None:
+                    self._bytes -= old[1]
+                self._data[key] = (pred, size)
+                self._bytes += size
+            while self._data and (len(self._data) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, size) = self._data.popitem(last=False)
+                self._bytes -= size
+                self.evictions += 1
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "version": self._version,
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / total, 4) if total else None,
+            "evictions": self.evictions,
+            "flushes": self.flushes,
+        }
@@ -0,0 +1,132 @@
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+
+def parse_s3_uri(uri: str) -> Tuple[str, str]:
+    """'s3://bucket/a/b' -> ('bucket', 'a/b')"""
+    parsed = urlparse(uri)
+    if parsed.scheme not in ("s3", "s3a"):
+        raise ValueError(f"No es una URI S3: {uri}")
+    return parsed.netloc, parsed.path.lstrip("/")
+
+
+class _Progress:
+    """Bytes descargados + log periódico de avance y throughput."""
+
+    def __init__(self, total: int, label: str, log_every_s: float = 5.0):
+        self.total = total
+        self.label = label
+        self.done = 0
+        self.start = time.time()
+        self.log_every_s = log_every_s
+        self._last_log = self.start
+        self._lock = threading.Lock()
+
+    def add(self, n: int):
+        with self._lock:
+            self.done += n
+            now = time.time()
+            if now - self._last_log < self.log_every_s:
+                return
+            self._last_log = now
+            done = self.done
+        elapsed = now - self.start
+        pct = 100.0 * done / self.total if self.total else 100.0
+        logger.info(
+            f" ⬇️  {self.label}: {done / MB:.0f}/{self.total / MB:.0f} MB "
+            f"({pct:.1f}%) a {done / MB / elapsed:.1f} MB/s"
+        )
+
+    def finish(self):
+        elapsed = max(time.time() - self.start, 1e-6)
+        logger.info(
+            f" ✅ {self.label}: {self.done / MB:.1f} MB en {elapsed:.2f}s "
+            f"({self.done / MB / elapsed:.1f} MB/s)"
+        )
+
+
+def _download_range(s3_client, bucket, key, path, start, end, progress):
+    """GET con cabecera Range escribiendo con pwrite en su offset del fichero."""
+    resp = s3_client.get_object(Bucket=bucket, Key=key, Range=f"bytes={start}-{end}")
+    fd = os.open(path, os.O_WRONLY)
+    try:
+        offset = start
+        for chunk in resp["Body"].iter_chunks(MB):
+            os.pwrite(fd, chunk, offset)
+            offset += len(chunk)
+            progress.add(len(chunk))
+    finally:
+        os.close(fd)
+
+    expected = end - start + 1
+    if offset - start != expected:
+        raise IOError(f"Rango incompleto en {key}: {offset - start}/{expected} bytes")
+
+
+def download_prefix(
+    s3_client,
+    uri: str,
+    dst_dir: str,
+    concurrency: int = 8,
+    chunk_size: int = 64 * MB,
+) -> int:
+    """
+    Descarga todos los objetos bajo `uri` (s3://bucket/prefix) en `dst_dir`
+    conservando la estructura relativa. Cada objeto se parte en rangos de
+    `chunk_size` que se piden en paralelo (`concurrency` GETs simultáneos) y
+    se escriben directamente en disco, sin acumular el fichero en memoria.
+    Devuelve el número de bytes descargados.
+    """
+    bucket, prefix = parse_s3_uri(uri)
+    prefix = prefix.rstrip("/")
+
+    objects: List[Tuple[str, int]] = []
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=f"{prefix}/" if prefix else ""):
+        for obj in page.get("Contents", []):
+            if not obj["Key"].endswith("/"):
+                objects.append((obj["Key"], obj["Size"]))
+
+    if not objects:
+        # Puede ser un único objeto en lugar de un "directorio"
+        head = s3_client.head_object(Bucket=bucket, Key=prefix)
+        objects = [(prefix, head["ContentLength"])]
+        prefix = prefix.rsplit("/", 1)[0] if "/" in prefix else ""
+
+    total = sum(size for _, size in objects)
+    progress = _Progress(total, f"s3://{bucket}/{prefix}")
+    logger.info(
+        f" Descargando {len(objects)} objetos ({total / MB:.1f} MB) desde s3://{bucket}/{prefix} "
+        f"[concurrency={concurrency}, chunk={chunk_size / MB:.0f} MB]"
+    )
+
+    tasks = []
+    for key, size in objects:
+        rel = key[len(prefix):].lstrip("/") if prefix else key
+        path = os.path.join(dst_dir, rel)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Reservar el fichero completo para que cada rango escriba en su offset
+        with open(path, "wb") as f:
+            f.truncate(size)
+        for start in range(0, size, chunk_size):
+            tasks.append((key, path, start, min(start + chunk_size, size) - 1))
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="s3-range") as pool:
+        futures = [
+            pool.submit(_download_range, s3_client, bucket, key, path, start, end, progress)
+            for key, path, start, end in tasks
+        ]
+        for future in futures:
+            future.result()
+
+    progress.finish()
+    return progress.done
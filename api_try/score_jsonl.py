@@ -0,0 +1,61 @@
+"""
+Scoring offline de un fichero JSONL con el mismo pipeline por chunks que
+POST /predict/stream.
+
+Uso:
+    python score_jsonl.py entrada.jsonl -o salida.jsonl
+    python score_jsonl.py entrada.jsonl --model-uri models:/CarroModel/3 --engine compiled
+    cat entrada.jsonl | python score_jsonl.py - > salida.jsonl
+"""
+
+import argparse
+import logging
+import sys
+import time
+
+import compact_model
+import streaming
+from tree_engine import CompiledForest
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger("score_jsonl")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scoring por chunks de ficheros NDJSON")
+    parser.add_argument("input", help="Fichero JSONL de entrada ('-' para stdin)")
+    parser.add_argument("-o", "--output", default="-", help="Fichero de salida ('-' para stdout)")
+    parser.add_argument("--model-uri", default="models:/CarroModel@production")
+    parser.add_argument("--chunk-size", type=int, default=1024)
+    parser.add_argument("--engine", choices=["sklearn", "compiled"], default="sklearn")
+    args = parser.parse_args(argv)
+
+    logger.info(f" Cargando modelo {args.model_uri}")
+    model = compact_model.load_model(args.model_uri)
+    if args.engine == "compiled" and not isinstance(model, CompiledForest):
+        model = CompiledForest.from_sklearn(model)
+
+    src = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    dst = sys.stdout if args.output == "-" else open(args.output, "w", encoding="utf-8")
+    start = time.time()
+    n_rows = 0
+    try:
+        for out_line in streaming.score_lines(src, model.predict, chunk_size=args.chunk_size):
+            dst.write(out_line)
+            n_rows += 1
+    except streaming.StreamFormatError as e:
+        logger.error(f" Entrada inválida: {e}")
+        return 1
+    finally:
+        if src is not sys.stdin:
+            src.close()
+        if dst is not sys.stdout:
+            dst.close()
+
+    elapsed = time.time() - start
+    logger.info(f" {n_rows} filas puntuadas en {elapsed:.2f}s ({n_rows / max(elapsed, 1e-9):.0f} filas/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,56 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTracker:
+    """
+    Estado del arranque en segundo plano: fase en curso y duración de cada
+    fase terminada. `/ready` lo expone mientras el modelo se carga y cada
+    fase queda en los logs para seguir el tiempo de arranque en frío.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.monotonic()
+        self.status = "starting"
+        self.error = None
+        self.phases = {}
+        self._running = {}
+        self.total_s = None
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.monotonic()
+        with self._lock:
+            self._running[name] = start
+        ok = False
+        try:
+            yield
+            ok = True
+        finally:
+            elapsed = time.monotonic() - start
+            with self._lock:
+                self._running.pop(name, None)
+                self.phases[name] = round(elapsed, 3)
+            logger.info(f" [arranque] {name}: {elapsed:.2f}s{'' if ok else ' (fallida)'}")
+
+    def finish(self, error: Exception = None):
+        self.total_s = round(time.monotonic() - self.started_at, 3)
+        self.status = "failed" if error is not None else "ready"
+        self.error = str(error) if error is not None else None
+        logger.info(f" [arranque] total: {self.total_s:.2f}s ({self.status}) fases={self.phases}")
+
+    def snapshot(self):
+        with self._lock:
+            now = time.monotonic()
+            return {
+                "status": self.status,
+                "running": {k: round(now - v, 3) for k, v in self._running.items()},
+                "phases": dict(self.phases),
+                "elapsed_s": self.total_s if self.total_s is not None else round(now - self.started_at, 3),
+                "error": self.error,
+            }
@@ -0,0 +1,158 @@
+"""
+Scoring por chunks de entradas NDJSON (una fila por línea).
+
+Formato de cada línea: una lista de features `[1, 2]` o un objeto
+`{"features": [1, 2], "id": ...}`; el `id` opcional se devuelve tal cual.
+Salida: una línea `{"prediction": ...}` (más `id` si venía) por fila, en el
+mismo orden. Los mismos generadores sirven al endpoint y al CLI, por lo que la
+memoria queda acotada a un chunk independientemente del tamaño de la entrada
+(y cada línea a `max_line_bytes`).
+"""
+
+import json
+from typing import AsyncIterable, AsyncIterator, Callable, Iterable, Iterator, List
+
+import numpy as np
+
+MAX_LINE_BYTES = 1024 * 1024
+
+
+class StreamFormatError(ValueError):
+    def __init__(self, line_no: int, message: str):
+        super().__init__(f"línea {line_no}: {message}")
+        self.line_no = line_no
+
+
+def parse_line(line: str, line_no: int):
+    """Devuelve (features, id) o None si la línea está vacía."""
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        record = json.loads(line)
+    except ValueError as e:
+        raise StreamFormatError(line_no, f"JSON inválido ({e})")
+
+    row_id = None
+    if isinstance(record, dict):
+        row_id = record.get("id")
+        record = record.get("features")
+    if not isinstance(record, list):
+        raise StreamFormatError(line_no, "se esperaba una lista de features o {\"features\": [...]}")
+    return record, row_id
+
+
+def _format(prediction, row_id) -> str:
+    out = {"prediction": prediction.item() if hasattr(prediction, "item") else prediction}
+    if row_id is not None:
+        out["id"] = row_id
+    return json.dumps(out) + "\n"
+
+
+def _to_matrix(rows: List[list], first_line_no: int) -> np.ndarray:
+    try:
+        X = np.asarray(rows, dtype=np.float64)
+    except ValueError:
+        X = None
+    if X is None or X.ndim != 2:
+        raise StreamFormatError(first_line_no, "las filas del chunk no tienen la misma longitud")
+    return X
+
+
+def score_lines(
+    lines: Iterable[str],
+    predict_fn: Callable[[np.ndarray], np.ndarray],
+    chunk_size: int = 1024,
+) -> Iterator[str]:
+    """Versión síncrona (CLI): consume `lines` y emite líneas NDJSON de salida."""
+    rows, ids, first = [], [], 1
+    for line_no, line in enumerate(lines, start=1):
+        parsed = parse_line(line, line_no)
+        if parsed is None:
+            continue
+        if not rows:
+            first = line_no
+        rows.append(parsed[0])
+        ids.append(parsed[1])
+        if len(rows) >= chunk_size:
+            for pred, row_id in zip(predict_fn(_to_matrix(rows, first)), ids):
+                yield _format(pred, row_id)
+            rows, ids = [], []
+    if rows:
+        for pred, row_id in zip(predict_fn(_to_matrix(rows, first)), ids):
+            yield _format(pred, row_id)
+
+
+def _decode(line: bytes, line_no: int) -> str:
+    try:
+        return line.decode("utf-8")
+    except UnicodeDecodeError as e:
+        raise StreamFormatError(line_no, f"UTF-8 inválido en el byte {e.start}")
+
+
+async def aiter_lines(chunks: AsyncIterable[bytes], max_line_bytes: int = MAX_LINE_BYTES) -> AsyncIterator[str]:
+    """
+    Parte un stream de bytes en líneas sin cargar el cuerpo entero. Una línea
+    de más de `max_line_bytes` (p.ej. un cuerpo sin saltos de línea) lanza
+    StreamFormatError en lugar de acumularse en memoria, igual que una línea
+    que no es UTF-8 válido.
+    """
+    buffer = b""
+    line_no = 0
+    async for chunk in chunks:
+        buffer += chunk
+        *complete, buffer = buffer.split(b"\n")
+        for line in complete:
+            line_no += 1
+            if len(line) > max_line_bytes:
+                raise StreamFormatError(line_no, f"línea de más de {max_line_bytes} bytes")
+            yield _decode(line, line_no)
+        if len(buffer) > max_line_bytes:
+            raise StreamFormatError(line_no + 1, f"línea de más de {max_line_bytes} bytes")
+    if buffer:
+        yield _decode(buffer, line_no + 1)
+
+
+async def ascore_lines(
+    lines: AsyncIterable[str],
+    apredict_fn,
+    chunk_size: int = 1024,
+) -> AsyncIterator[str]:
+    """Versión asíncrona (endpoint): igual que `score_lines` con `await apredict_fn(X)`."""
+    rows, ids, first, line_no = [], [], 1, 0
+    error = None
+    try:
+        # `lines` también puede lanzar StreamFormatError (línea demasiado
+        # larga o UTF-8 inválido)
+        async for line in lines:
+            line_no += 1
+            parsed = parse_line(line, line_no)
+            if parsed is None:
+                continue
+            if not rows:
+                first = line_no
+            rows.append(parsed[0])
+            ids.append(parsed[1])
+            if len(rows) >= chunk_size:
+                try:
+                    predictions = await apredict_fn(_to_matrix(rows, first))
+                except Exception as e:
+                    error = e
+                    rows = []
+                    break
+                yield "".join(_format(p, i) for p, i in zip(predictions, ids))
+                rows, ids = [], []
+    except StreamFormatError as e:
+        error = e
+
+    # Filas pendientes (también las anteriores a una línea inválida)
+    if rows:
+        try:
+            predictions = await apredict_fn(_to_matrix(rows, first))
+            yield "".join(_format(p, i) for p, i in zip(predictions, ids))
+        except Exception as e:
+            error = e
+
+    if error is not None:
+        # El status 200 ya se envió: el error viaja como última línea
+        yield json.dumps({"error": str(error), "line": getattr(error, "line_no", first)}) + "\n"
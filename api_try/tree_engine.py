@@ -0,0 +1,223 @@
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_TREE_LEAF = -1
+
+
+def _round_down_f32(thresholds: np.ndarray) -> np.ndarray:
+    """
+    Baja los umbrales a float32 sin cambiar ninguna decisión. sklearn compara
+    `X.astype(float32) <= threshold(float64)`; como X es float32, redondear el
+    umbral hacia abajo al float32 más cercano da exactamente el mismo resultado.
+    """
+    t32 = thresholds.astype(np.float32)
+    too_big = t32.astype(np.float64) > thresholds
+    t32[too_big] = np.nextafter(t32[too_big], np.float32(-np.inf))
+    return t32
+
+
+class CompiledForest:
+    """
+    Ensemble de árboles compilado a arrays planos y contiguos.
+
+    Todos los árboles se rellenan hasta el mismo número de nodos y se
+    recorren nivel a nivel con NumPy, por bloques de árboles (el bloque de
+    nodos cabe en caché). Los pares (árbol, fila) que llegan a una hoja salen
+    del conjunto activo, así que el coste sigue a la profundidad real de cada
+    camino y no a la del árbol más profundo.
+
+    Los hijos guardan índices globales (árbol * max_nodes + nodo) en un único
+    array `children` (árbol, nodo, [derecho, izquierdo]): el siguiente nodo
+    es un solo `take` de `2 * nodo + (x <= umbral)`. `left`/`right` son
+    vistas de ese array. Almacenamiento: `feature`/`children` en int32,
+    `threshold` en float32 (redondeo exacto, ver `_round_down_f32`) y `value`
+    en float64 para que la agregación de probabilidades coincida bit a bit
+    con sklearn. Todos son atributos NumPy simples, por lo que se comparten
+    con el modo de carga mmap.
+    """
+
+    # Pares (árbol, fila) por bloque y fracción de pares aún activos por
+    # debajo de la cual se compacta el conjunto (ver bench/run_bench.py, engine)
+    BLOCK_PAIRS = 1 << 14
+    SHRINK_BELOW = 0.5
+
+    def __init__(self, feature, threshold, left, right, value, max_depth, n_features_in_,
+                 classes_=None, missing_left=None):
+        self.feature = feature
+        self.threshold = threshold
+        self.children = np.stack([right, left], axis=-1).astype(np.int32, copy=False)
+        self.value = value
+        self.max_depth = max_depth
+        self.n_features_in_ = n_features_in_
+        self.classes_ = classes_
+        self.missing_left = missing_left
+
+    def __setstate__(self, state):
+        # Snapshots anteriores guardaban `left` y `right` por separado
+        if "children" not in state:
+            state["children"] = np.stack([state.pop("right"), state.pop("left")], axis=-1)
+        self.__dict__.update(state)
+
+    @property
+    def left(self):
+        return self.children[..., 1]
+
+    @property
+    def right(self):
+        return self.children[..., 0]
+
+    @property
+    def is_classifier(self):
+        return self.classes_ is not None
+
+    @property
+    def nbytes(self):
+        arrays = [self.feature, self.threshold, self.children, self.value]
+        if self.missing_left is not None:
+            arrays.append(self.missing_left)
+        return sum(a.nbytes for a in arrays)
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """
+        Compila un RandomForest/ExtraTrees (clasificador o regresor) o un
+        DecisionTree de sklearn con una sola salida. Lanza ValueError si el
+        modelo no está soportado.
+        """
+        estimators = getattr(model, "estimators_", None)
+        if estimators is None:
+            if not hasattr(model, "tree_"):
+                raise ValueError(f"Modelo no soportado por el motor compilado: {type(model).__name__}")
+            estimators = [model]
+        if getattr(model, "n_outputs_", 1) != 1:
+            raise ValueError("El motor compilado solo soporta modelos de una salida")
+
+        classes = getattr(model, "classes_", None)
+        trees = [est.tree_ for est in estimators]
+        n_trees = len(trees)
+        max_nodes = max(t.node_count for t in trees)
+        n_values = trees[0].value.shape[2]
+
+        if n_trees * max_nodes >= np.iinfo(np.int32).max:
+            raise ValueError("Ensemble demasiado grande para índices int32")
+
+        # Hojas y padding apuntan a sí mismas para que el recorrido sea idempotente
+        feature = np.zeros((n_trees, max_nodes), dtype=np.int32)
+        threshold = np.zeros((n_trees, max_nodes), dtype=np.float32)
+        left = np.arange(n_trees * max_nodes, dtype=np.int32).reshape(n_trees, max_nodes)
+        right = left.copy()
+        value = np.zeros((n_trees, max_nodes, n_values), dtype=np.float64)
+        has_missing = any(getattr(t, "missing_go_to_left", None) is not None for t in trees)
+        missing_left = np.zeros((n_trees, max_nodes), dtype=bool) if has_missing else None
+
+        for i, t in enumerate(trees):
+            n = t.node_count
+            is_split = t.children_left != _TREE_LEAF
+            offset = i * max_nodes
+            feature[i, :n] = np.where(is_split, t.feature, 0)
+            threshold[i, :n] = _round_down_f32(np.where(is_split, t.threshold, 0.0))
+            left[i, :n] = np.where(is_split, t.children_left + offset, left[i, :n])
+            right[i, :n] = np.where(is_split, t.children_right + offset, right[i, :n])
+
+            tree_value = t.value[:, 0, :]
+            if classes is not None:
+                # Proporciones por clase, igual que DecisionTreeClassifier.predict_proba
+                normalizer = tree_value.sum(axis=1, keepdims=True)
+                normalizer[normalizer == 0.0] = 1.0
+                tree_value = tree_value / normalizer
+            value[i, :n] = tree_value
+
+            if missing_left is not None and getattr(t, "missing_go_to_left", None) is not None:
+                missing_left[i, :n] = np.asarray(t.missing_go_to_left, dtype=bool)
+
+        compiled = cls(
+            feature=feature,
+            threshold=threshold,
+            left=left,
+            right=right,
+            value=value,
+            max_depth=max(t.max_depth for t in trees),
+            n_features_in_=model.n_features_in_,
+            classes_=classes,
+            missing_left=missing_left,
+        )
+        logger.info(
+            f" Modelo compilado: {n_trees} árboles, {max_nodes} nodos máx, "
+            f"profundidad {compiled.max_depth}, {compiled.nbytes / 1e6:.1f} MB"
+        )
+        return compiled
+
+    def _leaves(self, X: np.ndarray) -> np.ndarray:
+        """Índice global de hoja (n_trees, n_samples) para cada árbol y fila."""
+        n_trees, max_nodes = self.feature.shape
+        n_samples, n_features = X.shape
+        X_flat = X.ravel()
+        # int32 (la mitad de tráfico de memoria por nivel) salvo lotes enormes
+        index = np.int32 if X_flat.size < np.iinfo(np.int32).max else np.intp
+        rows = np.arange(n_samples, dtype=index) * n_features
+        leaves = np.empty((n_trees, n_samples), dtype=index)
+        # Sin NaN en el lote, la rama de valores perdidos es un gather inútil por nivel
+        missing_left = self.missing_left if self.missing_left is not None and np.isnan(X_flat).any() else None
+
+        trees_per_block = max(1, min(n_trees, self.BLOCK_PAIRS // max(n_samples, 1)))
+        for start in range(0, n_trees, trees_per_block):
+            stop = min(n_trees, start + trees_per_block)
+            roots = np.repeat(np.arange(start, stop, dtype=index) * max_nodes, n_samples)
+            walked = self._walk(X_flat, roots, np.tile(rows, stop - start), missing_left)
+            leaves[start:stop] = walked.reshape(-1, n_samples)
+        return leaves
+
+    def _walk(self, X_flat: np.ndarray, node: np.ndarray, rows: np.ndarray, missing_left=None) -> np.ndarray:
+        """Baja cada par (nodo, offset de fila en X_flat) hasta su hoja."""
+        feature = self.feature.ravel()
+        threshold = self.threshold.ravel()
+        children = self.children.ravel()
+        missing_left = missing_left.ravel() if missing_left is not None else None
+
+        leaves = node.copy()
+        active = np.arange(node.size, dtype=node.dtype)
+        while True:
+            x = X_flat.take(rows + feature.take(node))
+            go_left = x <= threshold.take(node)
+            if missing_left is not None:
+                go_left = np.where(np.isnan(x), missing_left.take(node), go_left)
+            # Hojas y padding apuntan a sí mismas: un par en hoja no se mueve
+            next_node = children.take(2 * node + go_left)
+            moving = next_node != node
+            n_moving = np.count_nonzero(moving)
+            if n_moving == 0:
+                leaves[active] = node
+                return leaves
+            if n_moving < self.SHRINK_BELOW * node.size:
+                done = ~moving
+                leaves[active[done]] = node[done]
+                active, node, rows = active[moving], next_node[moving], rows[moving]
+            else:
+                node = next_node
+
+    def _aggregate(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"Se esperaban {self.n_features_in_} features por fila")
+
+        leaves = self._leaves(X)
+        value = self.value.reshape(-1, self.value.shape[2])
+        # Sumar árbol a árbol, en el mismo orden que sklearn
+        total = np.zeros((X.shape[0], value.shape[1]), dtype=np.float64)
+        for t in range(leaves.shape[0]):
+            total += value.take(leaves[t], axis=0)
+        return total / leaves.shape[0]
+
+    def predict_proba(self, X):
+        if not self.is_classifier:
+            raise AttributeError("predict_proba solo disponible para clasificadores")
+        return self._aggregate(X)
+
+    def predict(self, X):
+        out = self._aggregate(X)
+        if self.is_classifier:
+            return self.classes_.take(np.argmax(out, axis=1), axis=0)
+        return out[:, 0]
@@ -0,0 +1,82 @@
+"""
+Compara dos resultados de `run_bench.py` y marca las regresiones.
+
+Uso:
+    python bench/compare.py bench/results/abc123-*.json bench/results/def456-*.json
+    python bench/compare.py base.json nuevo.json --threshold 0.15
+
+Sale con código 1 si alguna métrica empeora más que `--threshold` (relativo).
+"""
+
+import argparse
+import json
+import sys
+
+# Métricas donde más es mejor; en el resto (latencias, tiempos, RSS...) menos es mejor
+HIGHER_IS_BETTER = ("throughput_rps", "throughput_rows_s", "ok_during_swap", "ok_during_rollout", "min_ready",
+                    "speedup", "crossover_rows")
+# Contexto, no rendimiento
+IGNORED = ("config.", "api_env.", "commit", "timestamp", "swap.version", "load.concurrency",
+           "load.duration_s", "load.requests", "watcher_cleanup.versions", "watcher_cleanup.deleted",
+           "watcher_cleanup.s3_objects_deleted", "rollout.replicas", "rollout.version", "rollout.grace_s")
+
+
+def flatten(data, prefix=""):
+    out = {}
+    for key, value in data.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            out.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            out[name] = value
+    return out
+
+
+def compare(base, new, threshold):
+    base_flat, new_flat = flatten(base), flatten(new)
+    rows, regressions = [], []
+    for name in sorted(set(base_flat) | set(new_flat)):
+        if name.startswith(IGNORED):
+            continue
+        old, cur = base_flat.get(name), new_flat.get(name)
+        change = None
+        if old is not None and cur is not None and old != 0:
+            change = (cur - old) / abs(old)
+        worse = False
+        if change is not None:
+            higher_better = name.rsplit(".", 1)[-1] in HIGHER_IS_BETTER
+            worse = (-change if higher_better else change) > threshold
+        if worse:
+            regressions.append(name)
+        rows.append((name, old, cur, change, worse))
+    return rows, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compara dos resultados de benchmark")
+    parser.add_argument("base", help="JSON de referencia (p.ej. el commit anterior)")
+    parser.add_argument("new", help="JSON a evaluar")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Empeoramiento relativo tolerado")
+    args = parser.parse_args(argv)
+
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+
+    rows, regressions = compare(base, new, args.threshold)
+    print(f"{'métrica':<45} {base.get('commit') or 'base':>12} {new.get('commit') or 'nuevo':>12} {'cambio':>9}")
+    for name, old, cur, change, worse in rows:
+        fmt = lambda v: "-" if v is None else f"{v:.3f}".rstrip("0").rstrip(".")
+        pct = "" if change is None else f"{change * 100:+.1f}%"
+        print(f"{name:<45} {fmt(old):>12} {fmt(cur):>12} {pct:>9}{'  ⚠️' if worse else ''}")
+
+    if regressions:
+        print(f"\n{len(regressions)} regresiones por encima del {args.threshold:.0%}: {', '.join(regressions)}")
+        return 1
+    print("\nSin regresiones")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,666 @@
+"""
+Benchmark reproducible de la API y el watcher contra sustitutos locales.
+
+Levanta un registro MLflow (file store) y un S3 de moto, registra un modelo
+sintético y lanza `api_try/main.py` con uvicorn como subproceso. Mide:
+
+- motor de inferencia: `predict_proba` de sklearn frente a `CompiledForest`
+  por tamaño de lote, en proceso, y el lote a partir del cual sklearn gana
+  (`crossover_rows`; BATCH_MAX_SIZE y STREAM_CHUNK_SIZE deberían quedar por
+  debajo con INFERENCE_ENGINE=compiled)
+- arranque en frío (caché de artefactos vacía) y en caliente, hasta /ready
+- carga sostenida contra /predict: p50/p95/p99, throughput, errores y RSS
+  (proceso de la API + hijos, p.ej. el pool de inferencia)
+- swap de modelo bajo carga: duración y mayor hueco sin respuestas OK
+- rolling de varias réplicas (procesos en lugar de contenedores, con un
+  cliente que reintenta en otra réplica como haría nginx): duración, mínimo
+  de réplicas en /ready y errores vistos por los clientes
+- limpieza del watcher (versiones sin alias + GC dirigido en S3)
+
+El resultado es un JSON (por defecto en bench/results/) que se compara entre
+commits con `compare.py`.
+
+Uso:
+    python bench/run_bench.py
+    python bench/run_bench.py --concurrency 64 --duration 30 --api-env INFERENCE_ENGINE=compiled
+    python bench/run_bench.py --payloads peticiones.jsonl --skip-watcher
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import httpx
+import numpy as np
+
+import stand_ins
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API_DIR = os.path.join(REPO_ROOT, "api_try")
+WATCHER_DIR = os.path.join(REPO_ROOT, "watcher")
+MODEL_NAME = "BenchModel"
+ALIAS = "production"
+
+
+# --- Utilidades ---
+
+def percentiles(values):
+    if not values:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None, "mean_ms": None}
+    arr = np.asarray(values) * 1000
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "max_ms": round(float(arr.max()), 3),
+        "mean_ms": round(float(arr.mean()), 3),
+    }
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def _children(pid):
+    """PIDs descendientes de `pid` leyendo /proc (sin psutil)."""
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # El nombre del proceso va entre paréntesis y puede contener espacios
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        parents.setdefault(ppid, []).append(int(entry))
+    found, stack = [], [pid]
+    while stack:
+        for child in parents.get(stack.pop(), []):
+            found.append(child)
+            stack.append(child)
+    return found
+
+
+def rss_bytes(pid):
+    """RSS de `pid` y sus descendientes (las páginas compartidas cuentan en cada proceso)."""
+    total = 0
+    for p in [pid] + _children(pid):
+        try:
+            with open(f"/proc/{p}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        break
+        except OSError:
+            continue
+    return total
+
+
+class RssSampler:
+    """Muestrea el RSS de la API en un thread mientras dura una fase."""
+
+    def __init__(self, pid, interval=0.2):
+        self.pid = pid
+        self.interval = interval
+        self.samples = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.samples.append(rss_bytes(self.pid))
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def summary(self):
+        if not self.samples:
+            return {"rss_peak_mb": None, "rss_mean_mb": None}
+        return {
+            "rss_peak_mb": round(max(self.samples) / 1e6, 1),
+            "rss_mean_mb": round(sum(self.samples) / len(self.samples) / 1e6, 1),
+        }
+
+
+# --- API como subproceso ---
+
+class ApiServer:
+    def __init__(self, env, port, log_path):
+        self.env = env
+        self.port = port
+        self.url = f"http://127.0.0.1:{port}"
+        self.log_path = log_path
+        self.proc = None
+
+    def start(self):
+        self._log = open(self.log_path, "ab")
+        self.proc = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(self.port),
+             "--log-level", "warning"],
+            cwd=API_DIR, env=self.env, stdout=self._log, stderr=subprocess.STDOUT,
+            start_new_session=True,
+        )
+
+    def wait_ready(self, timeout):
+        """Tiempos hasta que el proceso responde (/live) y hasta que sirve el modelo (/ready)."""
+        start = time.perf_counter()
+        live_s = ready = None
+        with httpx.Client(timeout=2) as client:
+            while time.perf_counter() - start < timeout:
+                if self.proc.poll() is not None:
+                    raise RuntimeError(f"La API terminó al arrancar (ver {self.log_path})")
+                try:
+                    if live_s is None and client.get(f"{self.url}/live").status_code == 200:
+                        live_s = time.perf_counter() - start
+                    if live_s is not None:
+                        resp = client.get(f"{self.url}/ready")
+                        if resp.status_code == 200:
+                            ready = resp.json()
+                            break
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.05)
+        if ready is None:
+            raise RuntimeError(f"La API no estuvo lista en {timeout}s (ver {self.log_path})")
+        return {
+            "live_s": round(live_s, 3),
+            "ready_s": round(time.perf_counter() - start, 3),
+            "phases": (ready.get("startup") or {}).get("phases"),
+        }
+
+    def stop(self):
+        if self.proc is None:
+            return
+        # Grupo entero: incluye los workers del pool de inferencia
+        try:
+            os.killpg(self.proc.pid, signal.SIGTERM)
+            self.proc.wait(timeout=15)
+        except (ProcessLookupError, subprocess.TimeoutExpired):
+            try:
+                os.killpg(self.proc.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            self.proc.wait()
+        self._log.close()
+        self.proc = None
+
+
+# --- Motor de inferencia ---
+
+def run_engine(model, n_features, batch_sizes, min_time_s=0.5, seed=0):
+    """
+    Milisegundos por lote de `predict_proba` (sklearn) y del motor compilado
+    para cada tamaño de `batch_sizes`, con las mismas filas. `crossover_rows`
+    es el menor lote en el que sklearn es más rápido (None si nunca).
+    """
+    sys.path.insert(0, API_DIR)
+    from tree_engine import CompiledForest
+
+    compiled = CompiledForest.from_sklearn(model)
+    rng = np.random.default_rng(seed)
+
+    def per_call_ms(fn, X):
+        fn(X)
+        calls, start = 0, time.perf_counter()
+        while calls < 3 or time.perf_counter() - start < min_time_s:
+            fn(X)
+            calls += 1
+        return (time.perf_counter() - start) / calls * 1000
+
+    results, crossover = {}, None
+    for rows in batch_sizes:
+        X = rng.random((rows, n_features))
+        sklearn_ms = per_call_ms(model.predict_proba, X)
+        compiled_ms = per_call_ms(compiled.predict_proba, X)
+        results[f"rows_{rows}"] = {
+            "sklearn_ms": round(sklearn_ms, 3),
+            "compiled_ms": round(compiled_ms, 3),
+            "speedup": round(sklearn_ms / compiled_ms, 2),
+        }
+        if crossover is None and compiled_ms > sklearn_ms:
+            crossover = rows
+    results["crossover_rows"] = crossover
+    return results
+
+
+# --- Carga ---
+
+def load_payloads(path, n_features, rows_per_request, count=256, seed=0):
+    """
+    Cuerpos para POST /predict: de un fichero JSONL (una petición
+    `{"instances": [...]}` o una fila `[...]` por línea) o sintéticos.
+    """
+    if path:
+        payloads = []
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                record = json.loads(line)
+                if isinstance(record, dict) and "features" in record:
+                    record = record["features"]
+                payloads.append(record if isinstance(record, dict) else {"instances": [record]})
+        if not payloads:
+            raise ValueError(f"{path} no contiene peticiones")
+        return payloads
+    rng = np.random.default_rng(seed)
+    return [{"instances": rng.random((rows_per_request, n_features)).round(6).tolist()} for _ in range(count)]
+
+
+async def _load(url, payloads, concurrency, duration, stop=None, on_response=None, send=None):
+    """
+    `concurrency` clientes en bucle cerrado durante `duration` segundos (o
+    hasta que `stop()` devuelva True). Devuelve las latencias OK, los
+    códigos de error y el tiempo total. `send(client, body)` sustituye al
+    POST a `url` (devuelve el código de respuesta).
+    """
+    latencies, errors = [], {}
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(timeout=30, limits=limits) as client:
+        async def worker(worker_id):
+            rng = random.Random(worker_id)
+            while time.perf_counter() < deadline and not (stop is not None and stop()):
+                body = payloads[rng.randrange(len(payloads))]
+                start = time.perf_counter()
+                try:
+                    code = (await send(client, body)) if send is not None else (await client.post(url, json=body)).status_code
+                except httpx.HTTPError as e:
+                    code = type(e).__name__
+                end = time.perf_counter()
+                if code == 200:
+                    latencies.append(end - start)
+                else:
+                    errors[str(code)] = errors.get(str(code), 0) + 1
+                if on_response is not None:
+                    on_response(end, code)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return latencies, errors, elapsed
+
+
+def run_load(server, payloads, concurrency, duration, warmup):
+    url = f"{server.url}/predict"
+    if warmup > 0:
+        asyncio.run(_load(url, payloads, concurrency, warmup))
+    with RssSampler(server.proc.pid) as rss:
+        latencies, errors, elapsed = asyncio.run(_load(url, payloads, concurrency, duration))
+    rows = sum(len(p.get("instances", [])) for p in payloads) / len(payloads)
+    return {
+        "concurrency": concurrency,
+        "duration_s": round(elapsed, 2),
+        "requests": len(latencies) + sum(errors.values()),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "throughput_rows_s": round(len(latencies) * rows / elapsed, 1),
+        **percentiles(latencies),
+        **rss.summary(),
+    }
+
+
+def run_swap(server, payloads, concurrency, new_model, timeout, settle_s=1.0):
+    """
+    Con carga constante: registra una versión nueva, mueve el alias y pide el
+    swap en caliente. Mide la duración del swap y el mayor hueco entre dos
+    respuestas OK consecutivas durante el swap (≈ downtime para los clientes).
+    """
+    ok_times = []
+    state = {}
+
+    def on_response(t, code):
+        if code == 200:
+            ok_times.append(t)
+
+    def do_swap():
+        time.sleep(settle_s)  # carga estable antes del swap
+        version = stand_ins.register_version(MODEL_NAME, new_model, alias=ALIAS)
+        with httpx.Client(timeout=10) as client:
+            state["start"] = time.perf_counter()
+            client.post(f"{server.url}/admin/reload").raise_for_status()
+            while time.perf_counter() - state["start"] < timeout:
+                reload_state = client.get(f"{server.url}/admin/reload").json()
+                if str(reload_state.get("serving_version")) == version:
+                    break
+                if reload_state.get("status") == "failed":
+                    state["error"] = reload_state.get("error")
+                    break
+                time.sleep(0.02)
+            else:
+                state["error"] = f"timeout ({timeout}s)"
+            state["end"] = time.perf_counter()
+        state["version"] = version
+
+    swapper = threading.Thread(target=do_swap, daemon=True)
+    swapper.start()
+    # Se sigue enviando carga `settle_s` segundos tras el swap
+    stop = lambda: "end" in state and time.perf_counter() > state["end"] + settle_s
+    with RssSampler(server.proc.pid) as rss:
+        latencies, errors, _ = asyncio.run(
+            _load(f"{server.url}/predict", payloads, concurrency, timeout + 60, stop=stop, on_response=on_response)
+        )
+    swapper.join()
+
+    window = [t for t in ok_times if state.get("start", 0) <= t <= state.get("end", 0) + settle_s]
+    edges = [state.get("start", 0)] + window + [state.get("end", 0)]
+    return {
+        "version": state.get("version"),
+        "error": state.get("error"),
+        "swap_s": round(state["end"] - state["start"], 3) if "start" in state else None,
+        "max_gap_ms": round(max(b - a for a, b in zip(edges, edges[1:])) * 1000, 1) if "start" in state else None,
+        "ok_during_swap": len(window),
+        "errors": errors,
+        **{f"load_{k}": v for k, v in percentiles(latencies).items()},
+        **rss.summary(),
+    }
+
+
+def run_rollout(servers, payloads, concurrency, new_model, timeout, log_path, grace, settle_s=1.0):
+    """
+    Con carga constante repartida entre `servers`: registra una versión nueva
+    y lanza `watcher/rollout.py` sobre todas las réplicas. El cliente hace de
+    nginx: reparte en round-robin y ante un 503 o error de conexión reintenta
+    en la siguiente réplica. Mide la duración, el mínimo de réplicas en
+    /ready durante el despliegue y los errores que llegan a los clientes.
+
+    A diferencia de nginx, el cliente comparte CPU con las réplicas y bajo
+    carga tarda en reintentar tanto como una respuesta lenta: `grace` (margen
+    entre réplicas del rolling) tiene que cubrir ese retraso.
+    """
+    urls = [s.url for s in servers]
+    ok_times = []
+    state = {"retried": 0, "ready_samples": []}
+    turn = itertools.count()
+
+    async def send(client, body):
+        first = next(turn)
+        code = None
+        for i in range(len(urls)):
+            url = urls[(first + i) % len(urls)]
+            try:
+                code = (await client.post(f"{url}/predict", json=body)).status_code
+            except httpx.TransportError as e:
+                code = type(e).__name__
+            if code != 503 and not isinstance(code, str):
+                return code
+            state["retried"] += 1
+        return code
+
+    def on_response(t, code):
+        if code == 200:
+            ok_times.append(t)
+
+    def sample_ready():
+        with httpx.Client(timeout=1) as client:
+            while "end" not in state:
+                ready = 0
+                for url in urls:
+                    try:
+                        ready += client.get(f"{url}/ready").status_code == 200
+                    except httpx.HTTPError:
+                        pass
+                if "start" in state:
+                    state["ready_samples"].append(ready)
+                time.sleep(0.05)
+
+    def do_rollout():
+        time.sleep(settle_s)
+        version = stand_ins.register_version(MODEL_NAME, new_model, alias=ALIAS)
+        state["start"] = time.perf_counter()
+        with open(log_path, "ab") as log:
+            proc = subprocess.run(
+                [sys.executable, "rollout.py", version, *urls, "--ready-timeout", str(timeout), "--grace", str(grace)],
+                cwd=WATCHER_DIR, stdout=log, stderr=subprocess.STDOUT,
+            )
+        state["end"] = time.perf_counter()
+        state["version"] = version
+        state["ok"] = proc.returncode == 0
+
+    roller = threading.Thread(target=do_rollout, daemon=True)
+    sampler = threading.Thread(target=sample_ready, daemon=True)
+    roller.start()
+    sampler.start()
+    stop = lambda: "end" in state and time.perf_counter() > state["end"] + settle_s
+    latencies, errors, _ = asyncio.run(
+        _load(None, payloads, concurrency, timeout * len(urls) + 60, stop=stop, on_response=on_response, send=send)
+    )
+    roller.join()
+    sampler.join()
+
+    window = [t for t in ok_times if state.get("start", 0) <= t <= state.get("end", 0)]
+    edges = [state.get("start", 0)] + window + [state.get("end", 0)]
+    return {
+        "replicas": len(urls),
+        "grace_s": grace,
+        "version": state.get("version"),
+        "ok": state.get("ok"),
+        "rollout_s": round(state["end"] - state["start"], 3) if "start" in state else None,
+        "min_ready": min(state["ready_samples"]) if state["ready_samples"] else None,
+        "max_gap_ms": round(max(b - a for a, b in zip(edges, edges[1:])) * 1000, 1) if "start" in state else None,
+        "ok_during_rollout": len(window),
+        "retried": state["retried"],
+        "errors": errors,
+        **{f"load_{k}": v for k, v in percentiles(latencies).items()},
+    }
+
+
+# --- Watcher ---
+
+WATCHER_SNIPPET = """
+import json, sys, time
+import watcher
+start = time.time()
+reports = watcher.cleanup_unaliased_versions(sys.argv[1])
+elapsed = time.time() - start
+print("BENCH_RESULT " + json.dumps({
+    "elapsed_s": round(elapsed, 3),
+    "versions": len(reports),
+    "deleted": sum(r["status"] == "deleted" for r in reports),
+    "failed": sum(r["status"] == "failed" for r in reports),
+}))
+"""
+
+
+def run_watcher_cleanup(env, extra_versions, log_path):
+    """
+    Crea `extra_versions` versiones sin alias (con artefactos en S3) y cronometra
+    `cleanup_unaliased_versions` del watcher en un subproceso. El `mlflow gc`
+    final (docker exec) no existe fuera del stack: su fallo queda en el log.
+    """
+    model = stand_ins.train_model(n_estimators=5, max_depth=4, n_features=4, seed=1)
+    for _ in range(extra_versions):
+        stand_ins.register_version(MODEL_NAME, model)
+
+    s3 = stand_ins.boto3.client(
+        "s3", endpoint_url=env["MLFLOW_S3_ENDPOINT_URL"],
+        aws_access_key_id=env["AWS_ACCESS_KEY_ID"], aws_secret_access_key=env["AWS_SECRET_ACCESS_KEY"],
+        region_name="us-east-1",
+    )
+    count = lambda: sum(page.get("KeyCount", 0) for page in s3.get_paginator("list_objects_v2").paginate(Bucket=stand_ins.BUCKET))
+    objects_before = count()
+
+    with open(log_path, "ab") as log:
+        proc = subprocess.run(
+            [sys.executable, "-c", WATCHER_SNIPPET, MODEL_NAME],
+            cwd=WATCHER_DIR, env={**env, "MODEL_NAME": MODEL_NAME, "GC_MODE": "targeted", "METRICS_PORT": "0"},
+            stdout=subprocess.PIPE, stderr=log, text=True,
+        )
+        log.write(proc.stdout.encode())
+    result = {}
+    for line in proc.stdout.splitlines():
+        if line.startswith("BENCH_RESULT "):
+            result = json.loads(line[len("BENCH_RESULT "):])
+    if not result:
+        return {"error": f"el watcher terminó con código {proc.returncode} (ver {log_path})"}
+    result["s3_objects_deleted"] = objects_before - count()
+    return result
+
+
+# --- Main ---
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark de la API y el watcher con MLflow file store + S3 de moto")
+    parser.add_argument("--payloads", help="JSONL con peticiones {\"instances\": ...} o filas [...] (por defecto sintéticas)")
+    parser.add_argument("--rows-per-request", type=int, default=8)
+    parser.add_argument("--n-features", type=int, default=8)
+    parser.add_argument("--n-estimators", type=int, default=100)
+    parser.add_argument("--max-depth", type=int, default=12)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=15, help="Segundos de carga medida")
+    parser.add_argument("--warmup", type=float, default=3, help="Segundos de calentamiento (no se miden)")
+    parser.add_argument("--swap-timeout", type=float, default=120)
+    parser.add_argument("--ready-timeout", type=float, default=300)
+    parser.add_argument("--cleanup-versions", type=int, default=10, help="Versiones sin alias para la limpieza del watcher")
+    parser.add_argument("--api-env", action="append", default=[], metavar="CLAVE=VALOR",
+                        help="Variables extra para la API (p.ej. INFERENCE_ENGINE=compiled)")
+    parser.add_argument("--s3-endpoint", help="S3/MinIO existente en lugar de moto")
+    parser.add_argument("--engine-batches", default="1,16,64,256,1024,4096",
+                        help="Tamaños de lote para comparar sklearn y el motor compilado")
+    parser.add_argument("--skip-engine", action="store_true")
+    parser.add_argument("--skip-swap", action="store_true")
+    parser.add_argument("--skip-watcher", action="store_true")
+    parser.add_argument("--replicas", type=int, default=2, help="Réplicas para el rolling (0 = no se mide)")
+    parser.add_argument("--rollout-grace", type=float, default=10,
+                        help="Margen entre réplicas del rolling; con todo en un core un intento puede tardar >7s")
+    parser.add_argument("--workdir", help="Directorio de trabajo (por defecto uno temporal que se borra)")
+    parser.add_argument("-o", "--output", help="Fichero JSON de resultados (por defecto bench/results/<commit>-<fecha>.json)")
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="toy-mlflow-bench-")
+    os.makedirs(workdir, exist_ok=True)
+    log_path = os.path.join(workdir, "bench.log")
+    s3_endpoint, s3_server = stand_ins.start_s3(args.s3_endpoint)
+    env = stand_ins.stack_env(workdir, s3_endpoint)
+    os.environ.update(env)
+
+    api_env = {
+        **os.environ,
+        "MODEL_NAME": MODEL_NAME,
+        "MODEL_ALIAS": ALIAS,
+        "ARTIFACT_CACHE_DIR": os.path.join(workdir, "artifact-cache"),
+        "MODEL_MMAP_DIR": os.path.join(workdir, "mmap"),
+    }
+    for item in args.api_env:
+        key, _, value = item.partition("=")
+        api_env[key] = value
+
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "workdir")},
+        "api_env": {k: api_env[k] for k in sorted(api_env) if k.startswith(
+            ("MODEL_", "INFERENCE_", "BATCH_", "RESULT_CACHE_", "ARTIFACT_CACHE_", "S3_DOWNLOAD_", "WEB_"))},
+    }
+
+    server = None
+    replicas = []
+    try:
+        print(f"Registrando {MODEL_NAME} ({args.n_estimators} árboles, profundidad {args.max_depth})...")
+        stand_ins.ensure_experiment()
+        model = stand_ins.train_model(args.n_estimators, args.max_depth, args.n_features, seed=0)
+        stand_ins.register_version(MODEL_NAME, model, alias=ALIAS)
+        payloads = load_payloads(args.payloads, args.n_features, args.rows_per_request)
+
+        if not args.skip_engine:
+            batches = [int(b) for b in args.engine_batches.split(",") if b.strip()]
+            results["engine"] = run_engine(model, args.n_features, batches)
+            print(f"Motor compilado vs sklearn: {results['engine']}")
+
+        # Arranque en frío (caché de artefactos vacía) y con la caché ya poblada
+        results["cold_start"] = {}
+        for label in ("empty_cache", "warm_cache"):
+            server = ApiServer(api_env, free_port(), log_path)
+            server.start()
+            results["cold_start"][label] = server.wait_ready(args.ready_timeout)
+            print(f"Arranque ({label}): {results['cold_start'][label]['ready_s']}s hasta /ready")
+            if label == "empty_cache":
+                server.stop()
+
+        results["idle_rss_mb"] = round(rss_bytes(server.proc.pid) / 1e6, 1)
+        results["load"] = run_load(server, payloads, args.concurrency, args.duration, args.warmup)
+        load = results["load"]
+        print(f"Carga: {load['throughput_rps']} req/s, p50 {load['p50_ms']}ms, p99 {load['p99_ms']}ms")
+
+        if not args.skip_swap:
+            new_model = stand_ins.train_model(args.n_estimators, args.max_depth, args.n_features, seed=1)
+            results["swap"] = run_swap(server, payloads, args.concurrency, new_model, args.swap_timeout)
+            print(f"Swap: {results['swap']['swap_s']}s, mayor hueco {results['swap']['max_gap_ms']}ms")
+        server.stop()
+        server = None
+
+        if args.replicas > 0:
+            for i in range(args.replicas):
+                env_i = {**api_env, "MODEL_MMAP_DIR": os.path.join(workdir, f"mmap-{i}")}
+                replicas.append(ApiServer(env_i, free_port(), log_path))
+                replicas[-1].start()
+            for replica in replicas:
+                replica.wait_ready(args.ready_timeout)
+            new_model = stand_ins.train_model(args.n_estimators, args.max_depth, args.n_features, seed=2)
+            results["rollout"] = run_rollout(replicas, payloads, args.concurrency, new_model,
+                                             args.swap_timeout, log_path, args.rollout_grace)
+            rollout = results["rollout"]
+            print(f"Rolling ({rollout['replicas']} réplicas): {rollout['rollout_s']}s, "
+                  f"mínimo {rollout['min_ready']} en /ready, errores {rollout['errors'] or 0}")
+            for replica in replicas:
+                replica.stop()
+            replicas = []
+
+        if not args.skip_watcher:
+            results["watcher_cleanup"] = run_watcher_cleanup(env, args.cleanup_versions, log_path)
+            print(f"Limpieza del watcher: {results['watcher_cleanup']}")
+    finally:
+        if server is not None:
+            server.stop()
+        for replica in replicas:
+            replica.stop()
+        if s3_server is not None:
+            s3_server.stop()
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output or os.path.join(
+        REPO_ROOT, "bench", "results", f"{results['commit'] or 'nocommit'}-{datetime.now():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Resultados en {output}")
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Sustitutos locales del stack (MLflow + MinIO) para el benchmark.
+
+- Registro: MLflow con file store en un directorio temporal.
+- Artefactos: servidor S3 de moto (`moto[server]`) en un puerto local, o un
+  MinIO existente si se pasa su endpoint.
+
+Todo se configura con variables de entorno, igual que en docker-compose, de
+modo que la API y el watcher se lanzan como subprocesos sin cambios.
+"""
+
+import logging
+import os
+
+import boto3
+import numpy as np
+
+BUCKET = "mlflow"
+ACCESS_KEY = "minioadmin"
+SECRET_KEY = "minioadmin"
+
+
+def start_s3(endpoint=None):
+    """
+    Arranca un servidor S3 de moto (o usa `endpoint`) y crea el bucket.
+    Devuelve (endpoint_url, server); `server` es None si el S3 es externo.
+    """
+    server = None
+    if endpoint is None:
+        from moto.server import ThreadedMotoServer
+
+        # Sin una línea de log por cada petición S3
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+        server = ThreadedMotoServer(ip_address="127.0.0.1", port=0)
+        server.start()
+        host, port = server.get_host_and_port()
+        endpoint = f"http://{host}:{port}"
+
+    s3 = boto3.client(
+        "s3",
+        endpoint_url=endpoint,
+        aws_access_key_id=ACCESS_KEY,
+        aws_secret_access_key=SECRET_KEY,
+        region_name="us-east-1",
+    )
+    existing = {b["Name"] for b in s3.list_buckets()["Buckets"]}
+    if BUCKET not in existing:
+        s3.create_bucket(Bucket=BUCKET)
+    return endpoint, server
+
+
+def stack_env(root, s3_endpoint):
+    """Variables de entorno comunes a la API, el watcher y este proceso."""
+    return {
+        "MLFLOW_TRACKING_URI": f"file://{os.path.abspath(root)}/mlruns",
+        "MLFLOW_ALLOW_FILE_STORE": "true",
+        "MLFLOW_S3_ENDPOINT_URL": s3_endpoint,
+        "MLFLOW_S3_IGNORE_TLS": "true",
+        "AWS_ACCESS_KEY_ID": ACCESS_KEY,
+        "AWS_SECRET_ACCESS_KEY": SECRET_KEY,
+        "AWS_DEFAULT_REGION": "us-east-1",
+    }
+
+
+def ensure_experiment(name="bench"):
+    """Experimento con artefactos en el bucket S3 (como en el stack real)."""
+    import mlflow
+
+    experiment = mlflow.get_experiment_by_name(name)
+    if experiment is None:
+        experiment_id = mlflow.create_experiment(name, artifact_location=f"s3://{BUCKET}/{name}")
+    else:
+        experiment_id = experiment.experiment_id
+    mlflow.set_experiment(experiment_id=experiment_id)
+    return experiment_id
+
+
+def train_model(n_estimators, max_depth, n_features, seed):
+    from sklearn.ensemble import RandomForestClassifier
+
+    rng = np.random.default_rng(seed)
+    X = rng.random((max(200, n_estimators * 20), n_features))
+    y = (X[:, 0] + rng.normal(0, 0.3, len(X)) > 0.5).astype(int)
+    return RandomForestClassifier(
+        n_estimators=n_estimators, max_depth=max_depth, random_state=seed, n_jobs=-1
+    ).fit(X, y)
+
+
+def register_version(model_name, model, alias=None):
+    """Registra `model` como versión nueva (opcionalmente con `alias`) y devuelve su número."""
+    import mlflow
+    import mlflow.sklearn
+    from mlflow import MlflowClient
+
+    with mlflow.start_run():
+        info = mlflow.sklearn.log_model(
+            model, "model", registered_model_name=model_name, serialization_format="cloudpickle"
+        )
+    client = MlflowClient()
+    version = getattr(info, "registered_model_version", None)
+    if version is None:
+        version = max(int(v.version) for v in client.search_model_versions(f"name='{model_name}'"))
+    if alias:
+        client.set_registered_model_alias(model_name, alias, str(version))
+    return str(version)
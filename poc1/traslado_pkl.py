@@ -1,28 +1,216 @@
-import mlflow
-import pickle
+"""
+Registra un .pkl de scikit-learn en MLflow sin cargarlo en memoria.
+
+El fichero se sube tal cual a MinIO con multipart paralelo, en una ruta
+direccionada por contenido (`s3://mlflow/model-store/<sha256>/model.pkl`) junto a
+un MLmodel escrito a mano. Después se registra una versión que apunta ahí.
+Si ya hay una versión con el mismo checksum, o el contenido ya está en el
+bucket, no se sube nada: solo se registra la nueva versión.
+
+Las versiones no tienen los artefactos bajo el run, así que la limpieza del
+watcher (que borra el prefijo del run) nunca borra contenido compartido: el
+watcher borra `model-store/<sha256>` aparte, cuando ya ninguna versión apunta
+ahí (conteo de referencias).
+
+Uso:
+    python traslado_pkl.py ./Data/tu_modelo.pkl
+    python traslado_pkl.py ./Data/tu_modelo.pkl --model-name CarroModel --alias production
+"""
+
+import argparse
+import hashlib
 import os
+import platform
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+
+import boto3
+import mlflow
+from boto3.s3.transfer import TransferConfig
+from botocore.client import Config
+from botocore.exceptions import ClientError
+from mlflow import MlflowClient
+from mlflow.exceptions import MlflowException
 
 # 1. Configuración de conexión (Ajusta si los nombres de tus contenedores son distintos)
-os.environ["MLFLOW_S3_ENDPOINT_URL"] = "http://localhost:9000" # MinIO
-os.environ["AWS_ACCESS_KEY_ID"] = "minioadmin"
-os.environ["AWS_SECRET_ACCESS_KEY"] = "minioadmin"
-
-mlflow.set_tracking_uri("http://localhost:5000") # MLflow Server
-
-# 2. Cargar tu modelo local
-model_path = "./Data/tu_modelo.pkl" # La ruta de tu archivo actual
-with open(model_path, 'rb') as f:
-    model_obj = pickle.load(f)
-
-# 3. Subirlo a MLflow
-model_name = "CarroModel"
-
-with mlflow.start_run(run_name="Carga manual de modelo"):
-    # Logeamos el modelo en el storage (MinIO)
-    # Usamos mlflow.sklearn si es de scikit-learn, o pyfunc para cualquier pickle
-    mlflow.sklearn.log_model(
-        sk_model=model_obj, 
-        artifact_path="modelo_pkl",
-        registered_model_name=model_name
+os.environ.setdefault("MLFLOW_S3_ENDPOINT_URL", "http://localhost:9000")  # MinIO
+os.environ.setdefault("AWS_ACCESS_KEY_ID", "minioadmin")
+os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "minioadmin")
+
+mlflow.set_tracking_uri(os.getenv("MLFLOW_TRACKING_URI", "http://localhost:5000"))  # MLflow Server
+
+MB = 1024 * 1024
+SHA_TAG = "model_sha256"
+PICKLE_NAME = "model.pkl"
+
+
+def make_s3_client(max_pool_connections):
+    return boto3.client(
+        "s3",
+        endpoint_url=os.getenv("MLFLOW_S3_ENDPOINT_URL"),
+        aws_access_key_id=os.getenv("AWS_ACCESS_KEY_ID"),
+        aws_secret_access_key=os.getenv("AWS_SECRET_ACCESS_KEY"),
+        region_name=os.getenv("AWS_DEFAULT_REGION", "us-east-1"),
+        config=Config(signature_version="s3v4", max_pool_connections=max_pool_connections),
+    )
+
+
+def file_sha256(path, chunk_size=8 * MB):
+    """sha256 leyendo por bloques (memoria constante)"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def mlmodel_yaml(serialization_format):
+    """MLmodel mínimo del flavor sklearn para que `mlflow.sklearn.load_model` cargue el pkl"""
+    return (
+        "flavors:\n"
+        "  python_function:\n"
+        "    loader_module: mlflow.sklearn\n"
+        f"    model_path: {PICKLE_NAME}\n"
+        "    predict_fn: predict\n"
+        f"    python_version: {platform.python_version()}\n"
+        "  sklearn:\n"
+        "    code: null\n"
+        f"    pickled_model: {PICKLE_NAME}\n"
+        f"    serialization_format: {serialization_format}\n"
+        f"mlflow_version: {mlflow.__version__}\n"
+        f"model_uuid: {uuid.uuid4().hex}\n"
+        f"utc_time_created: '{datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f')}'\n"
+    )
+
+
+class _Progress:
+    """Callback de boto3: imprime el avance cada ~5%"""
+
+    def __init__(self, total):
+        self.total = total
+        self.done = 0
+        self._next = 0.05
+        self._lock = threading.Lock()
+        self._start = time.time()
+
+    def __call__(self, n):
+        with self._lock:
+            self.done += n
+            if self.total and self.done / self.total >= self._next:
+                elapsed = time.time() - self._start
+                print(f"   {self.done / self.total:5.0%}  {self.done / MB / max(elapsed, 1e-6):8.1f} MB/s")
+                self._next += 0.05
+
+
+def find_registered_source(client, model_name, sha):
+    """`source` de una versión ya registrada con el mismo checksum, o None"""
+    try:
+        versions = client.search_model_versions(f"name='{model_name}' and tags.{SHA_TAG}='{sha}'")
+    except MlflowException:
+        return None
+    return versions[0].source if versions else None
+
+
+def stored_content_exists(s3, bucket, key_prefix, sha, size):
+    """El contenido ya está en el bucket (MLmodel se escribe el último: marca de completado)"""
+    try:
+        s3.head_object(Bucket=bucket, Key=f"{key_prefix}/MLmodel")
+        head = s3.head_object(Bucket=bucket, Key=f"{key_prefix}/{PICKLE_NAME}")
+    except ClientError:
+        return False
+    return head["ContentLength"] == size and head.get("Metadata", {}).get("sha256") == sha
+
+
+def upload_model(s3, model_path, bucket, key_prefix, sha, size, serialization_format, concurrency, chunk_mb):
+    """Sube el pkl en streaming (multipart paralelo) y después el MLmodel"""
+    config = TransferConfig(
+        multipart_threshold=chunk_mb * MB,
+        multipart_chunksize=chunk_mb * MB,
+        max_concurrency=concurrency,
+        use_threads=True,
     )
-    print(f"Modelo subido y registrado como: {model_name}")
\ No newline at end of file
+    s3.upload_file(
+        model_path, bucket, f"{key_prefix}/{PICKLE_NAME}",
+        ExtraArgs={"Metadata": {"sha256": sha}},
+        Config=config,
+        Callback=_Progress(size),
+    )
+    head = s3.head_object(Bucket=bucket, Key=f"{key_prefix}/{PICKLE_NAME}")
+    if head["ContentLength"] != size:
+        raise RuntimeError(f"Tamaño subido {head['ContentLength']} != {size}")
+    s3.put_object(Bucket=bucket, Key=f"{key_prefix}/MLmodel", Body=mlmodel_yaml(serialization_format).encode())
+
+
+def register(model_path, model_name, alias=None, bucket="mlflow", prefix="model-store",
+             serialization_format="pickle", concurrency=16, chunk_mb=64):
+    client = MlflowClient()
+    s3 = make_s3_client(max_pool_connections=concurrency)
+    size = os.path.getsize(model_path)
+
+    start = time.time()
+    sha = file_sha256(model_path)
+    print(f"sha256 {sha} ({size / MB:.1f} MB, {time.time() - start:.1f}s)")
+
+    key_prefix = f"{prefix.strip('/')}/{sha}"
+    source = find_registered_source(client, model_name, sha)
+    uploaded = False
+    start = time.time()
+    if source is not None:
+        print(f"Mismo checksum ya registrado: se reutiliza {source}")
+    elif stored_content_exists(s3, bucket, key_prefix, sha, size):
+        source = f"s3://{bucket}/{key_prefix}"
+        print(f"Contenido ya presente en {source}: no se sube")
+    else:
+        source = f"s3://{bucket}/{key_prefix}"
+        print(f"Subiendo a {source} ({concurrency} partes en paralelo de {chunk_mb} MB)...")
+        upload_model(s3, model_path, bucket, key_prefix, sha, size, serialization_format, concurrency, chunk_mb)
+        uploaded = True
+    upload_s = time.time() - start
+
+    try:
+        client.create_registered_model(model_name)
+    except MlflowException:
+        pass  # ya existe
+
+    with mlflow.start_run(run_name="Carga manual de modelo") as run:
+        mlflow.log_params({"file": os.path.basename(model_path), "sha256": sha, "size_bytes": size})
+        mlflow.log_metrics({"upload_s": upload_s, "uploaded": int(uploaded)})
+        version = client.create_model_version(
+            model_name, source, run_id=run.info.run_id,
+            tags={SHA_TAG: sha, "model_size_bytes": str(size)},
+        )
+
+    if alias:
+        client.set_registered_model_alias(model_name, alias, version.version)
+    print(
+        f"Modelo registrado como {model_name} v{version.version}"
+        f"{f' (alias {alias})' if alias else ''} "
+        f"{'subido' if uploaded else 'sin subida'} en {upload_s:.1f}s"
+    )
+    return version
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Registra un .pkl en MLflow subiéndolo en streaming a MinIO")
+    parser.add_argument("model_path", nargs="?", default="./Data/tu_modelo.pkl")
+    parser.add_argument("--model-name", default="CarroModel")
+    parser.add_argument("--alias", help="Alias a asignar a la nueva versión (p.ej. production)")
+    parser.add_argument("--bucket", default="mlflow")
+    parser.add_argument("--prefix", default="model-store", help="Prefijo de los artefactos direccionados por contenido")
+    parser.add_argument("--serialization-format", choices=["pickle", "cloudpickle"], default="pickle")
+    parser.add_argument("--concurrency", type=int, default=16, help="Partes subidas en paralelo")
+    parser.add_argument("--chunk-mb", type=int, default=64, help="Tamaño de cada parte del multipart")
+    args = parser.parse_args(argv)
+
+    register(
+        args.model_path, args.model_name, alias=args.alias, bucket=args.bucket, prefix=args.prefix,
+        serialization_format=args.serialization_format, concurrency=args.concurrency, chunk_mb=args.chunk_mb,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
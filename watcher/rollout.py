@@ -0,0 +1,238 @@
+"""
+Despliegue rolling de una versión nueva en las réplicas de la API.
+
+Las réplicas se actualizan de una en una detrás de nginx:
+
+1. Antes de tocar una réplica, todas las demás deben estar en /ready (la
+   capacidad nunca baja de N-1).
+2. Drenado (POST /admin/drain): nginx deja de enviarle peticiones nuevas
+   y se espera a que terminen las que tiene en curso.
+3. Swap a la versión nueva (recarga en caliente o reinicio, lo decide el
+   llamador) y espera a que la réplica sirva esa versión.
+4. Calentamiento (POST /admin/warmup) todavía fuera del balanceo.
+5. Vuelta al balanceo (DELETE /admin/drain) y espera a /ready.
+6. Margen (`grace`) antes de drenar la siguiente: las peticiones rechazadas
+   con 503 en los últimos instantes del drenado se reintentan en otra réplica
+   y tienen que encontrarla abierta, y nginx tiene que volver a contar con la
+   réplica (tras un 503 la aparta `fail_timeout`, 2s en nginx.conf).
+
+Si un paso falla el despliegue se detiene: la réplica vuelve al balanceo con
+lo que esté sirviendo y el resto no se toca. Solo usa HTTP, así que se puede
+probar con procesos uvicorn locales en lugar de contenedores:
+
+    python rollout.py 3 http://127.0.0.1:8001 http://127.0.0.1:8002
+"""
+
+import argparse
+import sys
+import time
+from datetime import datetime
+
+import requests
+
+DRAIN_TIMEOUT = 60
+READY_TIMEOUT = 900
+POLL_INTERVAL = 0.5
+GRACE = 3.0
+
+
+def get_now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+def log(message):
+    print(f"[{get_now()}] {message}", flush=True)
+
+
+def _get(url, path, timeout=5):
+    """(código, json) o (None, None) si la réplica no responde"""
+    try:
+        resp = requests.get(f"{url}{path}", timeout=timeout)
+    except requests.RequestException:
+        return None, None
+    try:
+        return resp.status_code, resp.json()
+    except ValueError:
+        return resp.status_code, None
+
+
+def is_ready(url):
+    code, _ = _get(url, "/ready")
+    return code == 200
+
+
+def wait_until(predicate, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(POLL_INTERVAL)
+    return predicate()
+
+
+def wait_serving(url, version, timeout):
+    """Espera a que la réplica tenga cargada `version` (aunque esté drenando)"""
+    def serving():
+        code, state = _get(url, "/admin/drain")
+        return code == 200 and str(state.get("serving_version")) == str(version)
+    return wait_until(serving, timeout)
+
+
+def drain(url, timeout=DRAIN_TIMEOUT):
+    """Saca la réplica del balanceo; True si las peticiones en curso terminaron"""
+    resp = requests.post(f"{url}/admin/drain", params={"wait": timeout}, timeout=timeout + 10)
+    resp.raise_for_status()
+    return resp.json().get("idle", False)
+
+
+def undrain(url):
+    try:
+        requests.delete(f"{url}/admin/drain", timeout=10).raise_for_status()
+        return True
+    except requests.RequestException as e:
+        log(f"⚠️ No se pudo devolver {url} al balanceo: {e}")
+        return False
+
+
+def warm_up(url, rows=None):
+    body = {"rows": rows} if rows else {}
+    resp = requests.post(f"{url}/admin/warmup", json=body, timeout=READY_TIMEOUT)
+    resp.raise_for_status()
+    return resp.json()
+
+
+def roll_replica(url, others, version, swap, drain_timeout=DRAIN_TIMEOUT,
+                 ready_timeout=READY_TIMEOUT, warmup_rows=None):
+    """Un paso del despliegue sobre la réplica `url`. `swap()` devuelve True si ha ido bien"""
+    not_ready = [o for o in others if not wait_until(lambda o=o: is_ready(o), ready_timeout)]
+    if not_ready:
+        log(f"❌ Réplicas sin /ready: {', '.join(not_ready)}; no se drena {url} (capacidad < N-1)")
+        return False
+
+    start = time.time()
+    try:
+        idle = drain(url, drain_timeout)
+    except requests.RequestException as e:
+        log(f"❌ No se pudo drenar {url}: {e}")
+        return False
+    log(f"🚰 {url} drenada ({time.time() - start:.1f}s"
+        f"{'' if idle else f', quedaban peticiones en curso tras {drain_timeout}s'})")
+
+    try:
+        if not swap():
+            log(f"❌ Swap fallido en {url}")
+            return False
+        if not wait_serving(url, version, ready_timeout):
+            log(f"❌ {url} no sirve la versión {version} tras {ready_timeout}s")
+            return False
+        # Tras un reinicio la réplica arranca sin drenar: se vuelve a sacar
+        # del balanceo antes de calentar
+        drain(url, drain_timeout)
+        warm = warm_up(url, warmup_rows)
+        log(f"🔥 {url} calentada: {warm['batches']}x{warm['rows']} filas en {warm['seconds']}s")
+    except requests.RequestException as e:
+        log(f"❌ Error actualizando {url}: {e}")
+        return False
+    finally:
+        # Con fallo o sin él, la réplica vuelve al balanceo con lo que sirva
+        undrain(url)
+
+    if not wait_until(lambda: is_ready(url), ready_timeout):
+        log(f"❌ {url} no vuelve a /ready tras {ready_timeout}s")
+        return False
+    log(f"✅ {url} en servicio con la versión {version} ({time.time() - start:.1f}s)")
+    return True
+
+
+def rolling_update(urls, version, swap, grace=GRACE, **kwargs):
+    """
+    Actualiza `urls` de una en una; `swap(url)` lleva esa réplica a `version`.
+    Entre una réplica y la siguiente espera `grace` segundos con ambas en el
+    balanceo. Devuelve True si todas quedaron sirviendo la versión nueva.
+    """
+    start = time.time()
+    for i, url in enumerate(urls):
+        log(f"🔁 Rolling {i + 1}/{len(urls)}: {url} -> versión {version}")
+        others = [u for u in urls if u != url]
+        if not roll_replica(url, others, version, lambda: swap(url), **kwargs):
+            log(f"🛑 Despliegue detenido en {url}: {i}/{len(urls)} réplicas con la versión {version}")
+            return False
+        if i < len(urls) - 1 and grace > 0:
+            log(f"⏳ Margen de {grace:g}s antes de drenar la siguiente réplica")
+            time.sleep(grace)
+    log(f"🏁 Despliegue completado en {len(urls)} réplicas ({time.time() - start:.1f}s)")
+    return True
+
+
+def request_reload(url, timeout=READY_TIMEOUT):
+    """
+    POST /admin/reload. Si ya había una recarga en curso (`started` false,
+    p.ej. de una versión anterior del alias) espera a que acabe (done/failed)
+    y lo repite, para que la recarga que se sigue sea la de la versión actual.
+    Lanza requests.RequestException si la réplica no responde.
+    """
+    deadline = time.time() + timeout
+    while True:
+        resp = requests.post(f"{url}/admin/reload", timeout=10)
+        resp.raise_for_status()
+        if resp.json().get("started", True):
+            return True
+        log(f"⏳ {url} ya tiene una recarga en curso, esperando a que termine para repetirla...")
+
+        def finished():
+            code, state = _get(url, "/admin/reload")
+            return code == 200 and state.get("status") in ("done", "failed")
+
+        if not wait_until(finished, max(0.0, deadline - time.time())):
+            log(f"⏱️ TIMEOUT esperando a que {url} termine la recarga en curso")
+            return False
+
+
+def hot_reload(url, version, timeout=READY_TIMEOUT):
+    """Swap en caliente de una réplica (POST /admin/reload)"""
+    try:
+        if not request_reload(url, timeout):
+            return False
+    except requests.RequestException as e:
+        log(f"❌ No se pudo solicitar la recarga en {url}: {e}")
+        return False
+
+    def done():
+        code, state = _get(url, "/admin/reload")
+        if code != 200:
+            return False
+        if state.get("status") == "failed" and str(state.get("serving_version")) != str(version):
+            raise RuntimeError(state.get("error"))
+        return str(state.get("serving_version")) == str(version)
+
+    try:
+        if wait_until(done, timeout):
+            return True
+        log(f"⏱️ TIMEOUT esperando a que {url} sirva la versión {version}")
+        return False
+    except RuntimeError as e:
+        log(f"❌ {url} no pudo cargar la versión {version}: {e}")
+        return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Despliegue rolling de una versión en réplicas de la API")
+    parser.add_argument("version", help="Versión que deben servir las réplicas (la del alias)")
+    parser.add_argument("urls", nargs="+", help="URLs de las réplicas, en el orden de actualización")
+    parser.add_argument("--drain-timeout", type=float, default=DRAIN_TIMEOUT)
+    parser.add_argument("--ready-timeout", type=float, default=READY_TIMEOUT)
+    parser.add_argument("--warmup-rows", type=int, default=None)
+    parser.add_argument("--grace", type=float, default=GRACE,
+                        help="Segundos entre devolver una réplica al balanceo y drenar la siguiente")
+    args = parser.parse_args(argv)
+
+    ok = rolling_update(
+        args.urls, args.version, lambda url: hot_reload(url, args.version, args.ready_timeout),
+        grace=args.grace, drain_timeout=args.drain_timeout, ready_timeout=args.ready_timeout,
+        warmup_rows=args.warmup_rows,
+    )
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
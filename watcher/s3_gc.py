@@ -0,0 +1,91 @@
+"""
+Borrado dirigido de artefactos en S3/MinIO.
+
+En lugar de que `mlflow gc` recorra todo el backend store, el watcher pasa
+aquí solo los prefijos de artefactos de los runs que acaba de eliminar. Cada
+página de `list_objects_v2` (hasta 1000 claves) se convierte en una llamada
+`DeleteObjects` y las llamadas se ejecutan en paralelo sobre un único cliente
+boto3 con pool de conexiones.
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+import boto3
+from botocore.client import Config
+
+MAX_KEYS_PER_DELETE = 1000
+
+
+def make_s3_client(endpoint_url, access_key, secret_key, region="us-east-1", max_pool_connections=16):
+    return boto3.client(
+        "s3",
+        endpoint_url=endpoint_url,
+        aws_access_key_id=access_key,
+        aws_secret_access_key=secret_key,
+        region_name=region,
+        config=Config(signature_version="s3v4", max_pool_connections=max_pool_connections),
+        verify=False,
+    )
+
+
+def parse_s3_uri(uri):
+    """'s3://bucket/a/b' -> ('bucket', 'a/b/')"""
+    parsed = urlparse(uri)
+    if parsed.scheme not in ("s3", "s3a"):
+        raise ValueError(f"No es una URI S3: {uri}")
+    prefix = parsed.path.lstrip("/")
+    if prefix and not prefix.endswith("/"):
+        prefix += "/"
+    return parsed.netloc, prefix
+
+
+def _delete_batch(s3_client, bucket, keys):
+    resp = s3_client.delete_objects(
+        Bucket=bucket,
+        Delete={"Objects": [{"Key": k} for k in keys], "Quiet": True},
+    )
+    errors = resp.get("Errors", [])
+    return len(keys) - len(errors), errors
+
+
+def delete_prefixes(s3_client, uris, concurrency=8, batch_size=MAX_KEYS_PER_DELETE):
+    """
+    Borra todos los objetos bajo cada URI de `uris`. Devuelve un resumen con
+    objetos borrados, errores y duración. Nunca borra un prefijo vacío (sería
+    el bucket entero).
+    """
+    start = time.time()
+    batch_size = min(batch_size, MAX_KEYS_PER_DELETE)
+    deleted = 0
+    errors = []
+    futures = []
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="s3-gc") as pool:
+        paginator = s3_client.get_paginator("list_objects_v2")
+        for uri in uris:
+            bucket, prefix = parse_s3_uri(uri)
+            if not prefix:
+                errors.append({"Key": uri, "Message": "prefijo vacío, se ignora"})
+                continue
+            for page in paginator.paginate(Bucket=bucket, Prefix=prefix, PaginationConfig={"PageSize": batch_size}):
+                keys = [obj["Key"] for obj in page.get("Contents", [])]
+                if keys:
+                    futures.append(pool.submit(_delete_batch, s3_client, bucket, keys))
+
+        for future in futures:
+            try:
+                n, batch_errors = future.result()
+                deleted += n
+                errors.extend(batch_errors)
+            except Exception as e:
+                errors.append({"Key": None, "Message": str(e)})
+
+    return {
+        "prefixes": len(uris),
+        "batches": len(futures),
+        "deleted": deleted,
+        "errors": errors,
+        "elapsed_s": round(time.time() - start, 2),
+    }